@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter, strftime
+
+try:
+    import resource
+except ImportError:
+    # not on Windows
+    resource = None
+
+# headless, before Qt is imported
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PySide6  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+import regexpy  # noqa: E402
+
+PATTERN = r"id=(\d+)(?:-(\w))?"
+SIZES = {"1K": 1 << 10, "100K": 100 << 10, "10M": 10 << 20, "100M": 100 << 20}
+MATCHES = {"10": 10, "1K": 1000, "100K": 100_000, "1M": 1_000_000}
+# the default run leaves out the slowest cases, --full runs them all
+QUICK = {("1K", "10"), ("100K", "1K"), ("10M", "100K")}
+# memory fields compare flags, and how they are shown
+MEMORY = (("python_peak_bytes", "python heap"), ("max_rss_bytes", "max RSS"))
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+
+def make_sample(size, matches, seed=0):
+    # lines of words with matches spread evenly through them
+    rng = random.Random(seed)
+    step = size / matches
+    chunks = []
+    length = 0
+    next_match = step / 2
+    n = 0
+    while length < size:
+        if length >= next_match and n < matches:
+            word = f"id={n}-{rng.choice('abc')}" if n % 2 else f"id={n}"
+            n += 1
+            next_match += step
+        else:
+            word = rng.choice(WORDS)
+        chunks.append(word)
+        chunks.append("\n" if rng.random() < 0.1 else " ")
+        length += len(word) + 1
+    return "".join(chunks)[:size]
+
+
+class BenchRegexPy(regexpy.RegexPy):
+    # leaves the user's config alone
+    def get_cwd(self):
+        return self.bench_dir
+
+
+def max_rss():
+    # the process's peak resident memory so far, which unlike tracemalloc
+    # includes what Qt allocates, in bytes, 0 where it cannot be read
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes except on macOS
+    return rss if sys.platform == "darwin" else rss << 10
+
+
+def measure(stage, results, case, func):
+    # tracemalloc only sees the Python heap, not Qt's documents and layout
+    tracemalloc.start()
+    start = perf_counter()
+    func()
+    seconds = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss = max_rss()
+    results.append(
+        dict(
+            case,
+            stage=stage,
+            seconds=seconds,
+            python_peak_bytes=peak,
+            max_rss_bytes=rss,
+        )
+    )
+    print(
+        f"{case['case']:>10} {stage:<10} {seconds:9.4f}s"
+        f" python heap {peak:>12,}B max RSS {rss:>14,}B"
+    )
+
+
+def run_case(app, widget, size_name, matches_name, repeat):
+    size = SIZES[size_name]
+    matches = MATCHES[matches_name]
+    case = {"case": f"{size_name}/{matches_name}", "size": size}
+    case["matches"] = matches
+    text = make_sample(size, matches)
+    results = []
+    edit = widget.ui.textEditSample
+    for _ in range(repeat):
+        if widget.navigation_enabled:
+            widget.enable_navigation(False)
+        measure("load", results, case, lambda: edit.setPlainText(text))
+
+        def search():
+            widget.test_pattern()
+            while widget.search_worker is not None:
+                app.processEvents()
+
+        measure("search", results, case, search)
+        results[-1]["found"] = len(widget.matches)
+        scrollbar = edit.verticalScrollBar()
+
+        def highlight():
+            for f in (0, 0.5, 1):
+                scrollbar.setValue(round(scrollbar.maximum() * f))
+                widget.highlighter.window = (0, 0)
+                widget.highlighter.highlight_visible()
+
+        measure("highlight", results, case, highlight)
+
+        def lines():
+            widget.invalidate_lines()
+            widget.line_index.count()
+            widget.get_match_lines()
+
+        measure("lines", results, case, lines)
+        rng = random.Random(1)
+        positions = [rng.randrange(len(text) + 1) for _ in range(10_000)]
+
+        def find():
+            for p in positions:
+                widget.find_match(p)
+
+        measure("find", results, case, find)
+    return results
+
+
+def best(results):
+    # the fastest of the repeats, memory from the same one
+    fastest = {}
+    for r in results:
+        key = (r["case"], r["stage"])
+        if key not in fastest or r["seconds"] < fastest[key]["seconds"]:
+            fastest[key] = r
+    return list(fastest.values())
+
+
+def run(args):
+    app = QApplication([])
+    regexpy.app = app
+    bench_dir = tempfile.mkdtemp(prefix="regexpy-bench-")
+    with open(os.path.join(bench_dir, "regexpy.conf"), "w") as f:
+        # repeats are searched again rather than restored
+        f.write("[Execution]\npage_size=0\nresult_cache=0\n")
+    BenchRegexPy.bench_dir = bench_dir
+    widget = BenchRegexPy()
+    widget.show()
+    widget.ui.plainTextEditRegex.setPlainText(PATTERN)
+    if args.full or args.sizes or args.matches:
+        cases = [
+            (s, m)
+            for s in args.sizes or SIZES
+            for m in args.matches or MATCHES
+            # room for the match text
+            if MATCHES[m] <= SIZES[s] // 8
+        ]
+    else:
+        cases = sorted(QUICK, key=lambda c: SIZES[c[0]])
+    results = []
+    for s, m in cases:
+        results += best(run_case(app, widget, s, m, args.repeat))
+    report = {
+        "meta": {
+            "date": strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "pyside": PySide6.__version__,
+            "platform": platform.platform(),
+            "pattern": PATTERN,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"written to {args.output}")
+
+
+def compare(args):
+    old, new = (
+        {(r["case"], r["stage"]): r for r in json.load(open(fn))["results"]}
+        for fn in (args.old, args.new)
+    )
+    regressions = 0
+    print(f"{'case':>10} {'stage':<10} {'old':>9} {'new':>9} {'change':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key]["seconds"], new[key]["seconds"]
+        change = (b - a) / a if a else 0
+        flag = ""
+        # very short stages are mostly noise
+        if change > args.threshold and b - a > args.min_seconds:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(
+            f"{key[0]:>10} {key[1]:<10} {a:9.4f} {b:9.4f} {change:+8.1%}{flag}"
+        )
+        for field, name in MEMORY:
+            # missing from files written before they were recorded
+            pa, pb = old[key].get(field, 0), new[key].get(field, 0)
+            if pa and (pb - pa) / pa > args.threshold and pb - pa > 1 << 20:
+                print(f"{'':>10} {'':<10} {name} {pa:,} -> {pb:,}B  REGRESSION")
+                regressions += 1
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark searching, highlighting, marker line numbers"
+        " and match lookup on synthetic samples"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("run", help="run the benchmarks")
+    p.add_argument(
+        "-o",
+        "--output",
+        default=strftime("bench_%Y%m%d_%H%M%S.json"),
+        help="JSON file for the results (default: %(default)s)",
+    )
+    p.add_argument("--sizes", nargs="+", choices=list(SIZES))
+    p.add_argument("--matches", nargs="+", choices=list(MATCHES))
+    p.add_argument(
+        "--full",
+        action="store_true",
+        help="every size and match count, up to 100MB and 1M matches",
+    )
+    p.add_argument("--repeat", type=int, default=3)
+    p = commands.add_parser("compare", help="flag regressions between runs")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown flagged (default: %(default)s)",
+    )
+    p.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.005,
+        help="absolute slowdown below which nothing is flagged"
+        " (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
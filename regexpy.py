@@ -1,48 +1,100 @@
 #!/usr/bin/env python3
 
+import codecs
 import configparser
+import json
+import math
 import os
 import re
 import sys
+import threading
+from array import array
 from collections import namedtuple
 from dataclasses import dataclass
 from enum import auto
+from itertools import chain
 from shutil import copy
-from time import strftime
+from time import monotonic, perf_counter, strftime
 from traceback import print_exc
 
-from PySide6.QtCore import (
+# the start of the imports timed by --profile-startup, Qt takes most of it
+STARTED = perf_counter()
+
+from PySide6.QtCore import (  # noqa: E402
     QByteArray,
     QEvent,
     QFile,
+    QObject,
     QPoint,
     QPointF,
     Qt,
     QTextStream,
+    QThread,
+    QTimer,
+    Signal,
 )
-from PySide6.QtGui import (
+from PySide6.QtGui import (  # noqa: E402
+    QActionGroup,
     QColor,
     QKeyEvent,
     QKeySequence,
     QPainter,
+    QPalette,
     QPen,
+    QPixmap,
     QShortcut,
     QTextCharFormat,
     QTextCursor,
     QTextDocument,
 )
-from PySide6.QtSvgWidgets import QSvgWidget
-from PySide6.QtWidgets import (
+from PySide6.QtSvgWidgets import QSvgWidget  # noqa: E402
+from PySide6.QtWidgets import (  # noqa: E402
+    QAbstractItemView,
     QApplication,
     QCheckBox,
+    QDialog,
     QFileDialog,
     QHBoxLayout,
+    QHeaderView,
+    QInputDialog,
+    QLabel,
     QMenu,
+    QMessageBox,
+    QProgressBar,
+    QProgressDialog,
+    QPushButton,
     QScrollBar,
+    QTableWidget,
+    QTableWidgetItem,
+    QTextEdit,
     QToolButton,
+    QVBoxLayout,
     QWidget,
 )
-from regexpy_ui import Ui_Form
+from regexpy_engine import (  # noqa: E402
+    ENGINES,
+    CorpusResult,
+    GuardedScan,
+    MappedFile,
+    MatchStore,
+    PatternCache,
+    ResultCache,
+    Timings,
+    combine_patterns,
+    compare_engines,
+    compare_pattern_set,
+    corpus_files,
+    engine_of,
+    export_matches,
+    pattern_name,
+    source_of,
+    survey,
+)
+from regexpy_redos import LINEAR, analyse, describe  # noqa: E402
+from regexpy_ui import Ui_Form  # noqa: E402
+
+# what QTextDocument.toPlainText replaces, for text read with a QTextCursor
+PLAIN_TEXT = str.maketrans("\u00a0\u2028\u2029", " \n\n")
 
 
 @dataclass
@@ -55,6 +107,7 @@ class Colours:
         match_background=QColor(Qt.yellow),
         group_foreground=QColor(Qt.white),
         group_background=QColor(Qt.red),
+        regex_risk=QColor(255, 140, 0),
     ):
         colours = {
             "regex_valid": regex_valid,
@@ -63,6 +116,7 @@ class Colours:
             "match_background": match_background,
             "group_foreground": group_foreground,
             "group_background": group_background,
+            "regex_risk": regex_risk,
         }
 
         self.colours = colours
@@ -112,64 +166,604 @@ class Move(auto):
     ToAnchor = auto()
 
 
-class Expression:
-    @dataclass
-    class PatternGroup:
-        level: int
-        start: int
-        end: int
-        capturing: bool
-        name: str
+class MatchWorker(QThread):
+    # matches are handed over in batches, either when batch_size is
+    # reached or batch_interval seconds have passed since the last one.
+    # With a page_size the scan pauses after each page of matches until
+    # more are asked for. With a budget the scan runs in a subprocess,
+    # which is handed source (by default the text) - re holds the GIL
+    # while it looks for the next match, which in this thread would hold
+    # up the GUI
+    batch_size = 1000
+    batch_interval = 0.1
 
-        def __init__(
-            self, level=None, start=None, end=None, capturing=False, name=None
-        ):
-            self.level = level
-            self.start = start
-            self.end = end
-            self.capturing = capturing
-            self.name = name
+    batch_ready = Signal(object)
+    progress = Signal(int)
 
-    def __init__(self, pattern):
+    def __init__(
+        self, pattern, text, budget=None, page_size=0, source=None, parent=None
+    ):
+        super().__init__(parent)
         self.pattern = pattern
-        self.groups = self.find_groups(pattern.pattern)
-        self.capturing = [g for g in self.groups if g.capturing]
-
-    def find_groups(self, pattern):
-        groups = []
-        level_indexes = []
-        index, level = (0, 0)
-        for i, c in enumerate(pattern):
-            if c == "(":
-                if (pattern[i + 1]) != "?":
-                    cap = True
-                    name = None
-                elif pattern[i + 2] == "P":
-                    m = re.search(r"<(.*)>", pattern[i + 3 :])  # noqa: E203
-                    if m:
-                        cap = True
-                        name = m[1]
-                    else:
-                        cap = False
-                        name = None
+        self.text = text
+        self.source = text if source is None else source
+        self.budget = budget
+        self.page_size = page_size
+        self.scan = None
+        self.cancelled = False
+        self.found = 0
+        # time spent scanning, not waiting for the next page to be wanted
+        self.scan_time = 0.0
+        self.wanted = page_size or float("inf")
+        self.demand = threading.Condition()
+        # progress is an int signal, offsets in files over 2GB are scaled
+        self.shift = max(len(text).bit_length() - 31, 0)
+
+    def cancel(self):
+        with self.demand:
+            self.cancelled = True
+            self.demand.notify()
+        if self.scan is not None:
+            self.scan.cancel()
+
+    def more(self, everything=False):
+        # another page, or the rest, once the current page is done
+        with self.demand:
+            if everything:
+                self.wanted = float("inf")
+            else:
+                self.wanted = max(self.wanted, self.found + self.page_size)
+            self.demand.notify()
+
+    def is_paused(self):
+        return self.found >= self.wanted
+
+    def run(self):
+        if self.budget is not None:
+            self.scan = GuardedScan(
+                self.pattern.pattern,
+                self.pattern.flags,
+                self.source,
+                *self.budget,
+                engine=engine_of(self.pattern).name,
+            )
+            matches = self.scan
+        else:
+            matches = self.pattern.finditer(self.text)
+        # flattened match.regs, see MatchStore.extend
+        batch = array("q")
+        count = 0
+        last = monotonic()
+        end = 0
+        for m in matches:
+            if self.cancelled:
+                return
+            regs = m.regs
+            batch.extend(chain.from_iterable(regs))
+            count += 1
+            self.found += 1
+            end = regs[0][1]
+            now = monotonic()
+            paused = self.found >= self.wanted
+            if (
+                paused
+                or count >= self.batch_size
+                or now - last >= self.batch_interval
+            ):
+                self.scan_time += now - last
+                self.batch_ready.emit(batch)
+                self.progress.emit(end >> self.shift)
+                batch = array("q")
+                count = 0
+                if paused:
+                    with self.demand:
+                        while self.found >= self.wanted and not self.cancelled:
+                            self.demand.wait()
+                last = monotonic()
+        self.scan_time += monotonic() - last
+        if batch:
+            self.batch_ready.emit(batch)
+        if self.scan is None or self.scan.status.state == "complete":
+            end = len(self.text)
+        self.progress.emit(end >> self.shift)
+
+
+class FileLoader(QThread):
+    # a sample file is read and decoded in the background and handed over
+    # a chunk of about chunk_size bytes at a time. Reading waits while
+    # queued chunks are still to be inserted, so that the GUI inserts one
+    # chunk per event loop pass rather than all of the file at once
+    chunk_size = 1 << 18
+    queued = 2
+
+    chunk_ready = Signal(str)
+    progress = Signal(int)
+
+    def __init__(self, filename, size, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.size = size
+        self.cancelled = False
+        self.error = None
+        self.room = threading.Semaphore(self.queued)
+        # as in MatchWorker
+        self.shift = max(size.bit_length() - 31, 0)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def inserted(self):
+        self.room.release()
+
+    def emit_chunk(self, text):
+        while not self.room.acquire(timeout=0.1):
+            if self.cancelled:
+                return
+        self.chunk_ready.emit(text)
+
+    def run(self):
+        try:
+            with open(self.filename, "rb") as f:
+                data = f.read(self.chunk_size)
+                # UTF-8 unless there is a byte order mark, as QTextStream
+                if data[:4] in (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE):
+                    encoding = "utf-32"
+                elif data[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+                    encoding = "utf-16"
                 else:
-                    cap = False
-                    name = None
-                groups.append(
-                    self.PatternGroup(level, i, capturing=cap, name=name)
+                    encoding = "utf-8-sig"
+                decoder = codecs.getincrementaldecoder(encoding)("replace")
+                done = 0
+                held = ""
+                while data:
+                    if self.cancelled:
+                        return
+                    done += len(data)
+                    text = held + decoder.decode(data)
+                    # a CR LF split between chunks would make two lines
+                    held = text[-1:] if text.endswith("\r") else ""
+                    self.emit_chunk(text[: len(text) - len(held)])
+                    self.progress.emit(done >> self.shift)
+                    data = f.read(self.chunk_size)
+                self.emit_chunk(held + decoder.decode(b"", True))
+        except OSError as e:
+            self.error = str(e)
+
+
+class CorpusWorker(QThread):
+    # searches the files of a corpus in a pool of processes, the result
+    # of each is handed over as it is done
+    result_ready = Signal(object)
+
+    poll_interval = 0.1
+
+    def __init__(self, pattern, paths, jobs, parent=None):
+        super().__init__(parent)
+        self.pattern = pattern
+        self.paths = paths
+        self.jobs = jobs
+        self.cancelled = False
+        self.pool = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.pool is not None:
+            # files being searched are finished, the others dropped
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self):
+        # imported on first use, they take a while
+        import multiprocessing
+        from concurrent.futures import (
+            FIRST_COMPLETED,
+            ProcessPoolExecutor,
+            wait,
+        )
+
+        # not fork - the parent is running Qt threads
+        ctx = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(self.jobs, mp_context=ctx)
+        self.pool = pool
+        try:
+            futures = {
+                pool.submit(survey, (self.pattern, p, "utf-8")): p
+                for p in self.paths
+            }
+            pending = set(futures)
+            while pending:
+                # polled, futures cancelled by shutdown do not wake a wait
+                done, pending = wait(
+                    pending, self.poll_interval, FIRST_COMPLETED
                 )
-                level_indexes.append(index)
-                index += 1
-                level += 1
-            elif c == ")":
-                groups[level_indexes.pop()].end = i
-                level -= 1
-        return groups
+                if self.cancelled:
+                    return
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # e.g. a worker killed
+                        path = futures[future]
+                        result = CorpusResult(path, 0, None, 0.0, str(e))
+                    self.result_ready.emit(result)
+        finally:
+            # not waiting for the files still being searched when cancelled,
+            # unlike leaving a with block
+            pool.shutdown(wait=not self.cancelled, cancel_futures=True)
+
+
+class CorpusDialog(QDialog):
+    # the matches of the regex in each file of a corpus, a file is opened
+    # in the sample editor by double clicking it
+    columns = ("File", "Matches", "First match", "Search ms", "Error")
+
+    open_file = Signal(str)
+
+    def __init__(self, spec, paths, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"RegexPy - corpus {spec}")
+        self.resize(700, 400)
+        layout = QVBoxLayout(self)
+        table = QTableWidget(0, len(self.columns))
+        table.setHorizontalHeaderLabels(self.columns)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        table.cellDoubleClicked.connect(
+            lambda row, column: self.open_file.emit(
+                table.item(row, 0).data(Qt.UserRole)
+            )
+        )
+        layout.addWidget(table)
+        self.table = table
+        status = QHBoxLayout()
+        self.label = QLabel("0 matches in 0 files")
+        status.addWidget(self.label, 1)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumSize(200, 16)
+        self.progress_bar.setRange(0, len(paths))
+        self.progress_bar.setFormat("%v / %m files")
+        status.addWidget(self.progress_bar)
+        self.button = QPushButton("Cancel")
+        status.addWidget(self.button)
+        layout.addLayout(status)
+        # file names are shown relative to the directory they share
+        self.root = os.path.commonpath([os.path.dirname(p) for p in paths])
+        self.found = 0
+
+    def add_result(self, result):
+        table = self.table
+        # rows are not moved while one is added
+        table.setSortingEnabled(False)
+        row = table.rowCount()
+        table.insertRow(row)
+        item = QTableWidgetItem(os.path.relpath(result.path, self.root))
+        item.setData(Qt.UserRole, result.path)
+        item.setToolTip(result.path)
+        table.setItem(row, 0, item)
+        values = (result.count, result.first, round(result.seconds * 1000, 1))
+        for column, value in enumerate(values, 1):
+            item = QTableWidgetItem()
+            if value is not None:
+                item.setData(Qt.DisplayRole, value)
+            item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            table.setItem(row, column, item)
+        table.setItem(row, 4, QTableWidgetItem(result.error or ""))
+        table.setSortingEnabled(True)
+        self.found += result.count
+        self.progress_bar.setValue(row + 1)
+        self.label.setText(f"{self.found} matches in {row + 1} files")
+
+    def set_done(self, cancelled=False):
+        self.progress_bar.setVisible(False)
+        if cancelled:
+            self.label.setText(self.label.text() + " (cancelled)")
+        self.button.setText("Close")
+
+
+class ExportWorker(QThread):
+    # writes the matches of a pattern to a JSON lines or CSV file as they
+    # are found, so that none are kept in memory. With a budget the matches
+    # are found in a subprocess, as in MatchWorker
+    progress = Signal(int)
+
+    def __init__(
+        self,
+        pattern,
+        text,
+        filename,
+        fmt,
+        names,
+        budget=None,
+        source=None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.pattern = pattern
+        self.text = text
+        self.source = text if source is None else source
+        self.budget = budget
+        self.filename = filename
+        self.fmt = fmt
+        self.names = names
+        self.scan = None
+        # a file searched on disk, closed once written
+        self.mapped = None
+        self.count = 0
+        self.cancelled = False
+        self.error = None
+        # as in MatchWorker
+        self.shift = max(len(text).bit_length() - 31, 0)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.scan is not None:
+            self.scan.cancel()
+
+    def run(self):
+        matches = None
+        if self.budget is not None:
+            self.scan = GuardedScan(
+                self.pattern.pattern,
+                self.pattern.flags,
+                self.source,
+                *self.budget,
+                engine=engine_of(self.pattern).name,
+            )
+            matches = self.scan
+        try:
+            with open(
+                self.filename,
+                "w",
+                encoding="utf-8",
+                newline="",
+                buffering=1 << 20,
+            ) as f:
+                for count, offset in export_matches(
+                    self.pattern,
+                    self.text,
+                    f,
+                    self.fmt,
+                    self.names,
+                    matches=matches,
+                ):
+                    self.count = count
+                    self.progress.emit(offset >> self.shift)
+                    if self.cancelled:
+                        return
+        except OSError as e:
+            self.error = str(e)
+
+
+class MatchHighlighter(QObject):
+    # only matches in and around the viewport are highlighted, on demand as
+    # the view scrolls, as extra selections - these are painted over the
+    # text, so unlike char or layout formats they need no relayout and
+    # leave the document (and its format table) untouched
+    Span = namedtuple("Span", "start end foreground background underline")
+
+    def __init__(self, edit, colours, parent=None):
+        super().__init__(parent)
+        self.edit = edit
+        self.colours = colours
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.highlight_visible)
+        scrollbar = edit.verticalScrollBar()
+        scrollbar.valueChanged.connect(self.schedule)
+        scrollbar.rangeChanged.connect(self.schedule)
+        self.formats = {}
+        # match colours by the group which matched, see set_sources
+        self.sources = {}
+        self.set_index()
+
+    def schedule(self):
+        self.timer.start()
+
+    def set_index(self, index=None):
+        self.index = index
+        self.count = 0 if index is None else len(index)
+        self.spans = {}
+        # document range covered by the current selections
+        self.window = (0, 0)
+        self.edit.setExtraSelections([])
+
+    def set_sources(self, sources):
+        self.sources = sources
+        self.spans = {}
+        self.window = (0, 0)
+        self.schedule()
+
+    def update(self):
+        if self.count == len(self.index):
+            return
+        first = self.index.start(self.count)
+        self.count = len(self.index)
+        if first < self.window[1]:
+            self.window = (0, 0)
+        self.schedule()
+
+    def background(self, spans, pos):
+        for s in reversed(spans):
+            if s.start <= pos < s.end:
+                return s.background
+        return None
+
+    def match_spans(self, index):
+        # an adjacent match or group is drawn darker, so a match's colours
+        # depend on the run of adjacent matches before it
+        start, end = self.index.start, self.index.end
+        first = index
+        while (
+            first > 0
+            and first not in self.spans
+            and end(first - 1) == start(first)
+        ):
+            first -= 1
+        for i in range(first, index + 1):
+            if i in self.spans:
+                continue
+            m = self.index[i]
+            if i > 0 and end(i - 1) == m.start:
+                previous = self.spans[i - 1]
+            else:
+                previous = []
+            spans = []
+            c = self.colours
+            bg = c.match_background
+            for gid, colour in self.sources.items():
+                if m.groups[gid - 1].start >= 0:
+                    bg = colour
+                    break
+            if self.background(previous, m.start - 1) == bg:
+                bg = bg.darker(150)
+            spans.append(self.Span(m.start, m.end, c.match_foreground, bg, 0))
+            # the group of a source is the whole match
+            groups = [g for g in m.groups if g.index not in self.sources]
+            m_len = m.start - m.end
+            g_total = 0
+            for g in groups:
+                g_total += g.start - g.end
+            underline = g_total == m_len
+            for g in groups:
+                if g.end > g.start:
+                    bg = c.group_background
+                    p = g.start - 1
+                    covering = self.background(spans, p)
+                    if covering is None:
+                        covering = self.background(previous, p)
+                    if covering == bg:
+                        bg = bg.darker(150)
+                    spans.append(
+                        self.Span(
+                            g.start, g.end, c.group_foreground, bg, underline
+                        )
+                    )
+            self.spans[i] = spans
+        return self.spans[index]
+
+    def char_format(self, span):
+        key = (span.foreground.rgba(), span.background.rgba(), span.underline)
+        cf = self.formats.get(key)
+        if cf is None:
+            cf = QTextCharFormat()
+            cf.setForeground(span.foreground)
+            cf.setBackground(span.background)
+            if span.underline:
+                cf.setUnderlineColor(self.colours.match_background)
+                cf.setUnderlineStyle(QTextCharFormat.SingleUnderline)
+            self.formats[key] = cf
+        return cf
+
+    def position_at(self, y):
+        layout = self.edit.document().documentLayout()
+        return layout.hitTest(QPointF(0, max(y, 0)), Qt.FuzzyHit)
+
+    def highlight_visible(self):
+        if not self.count:
+            return
+        height = self.edit.viewport().height()
+        top = self.edit.verticalScrollBar().value()
+        start, end = self.window
+        if start <= self.position_at(top) and (
+            self.position_at(top + height) < end
+            or end >= self.edit.document().characterCount()
+        ):
+            return
+        # a page either side of the viewport is highlighted in advance
+        start = self.position_at(top - height)
+        end = self.position_at(top + height * 2)
+        doc = self.edit.document()
+        block = doc.findBlock(end).next()
+        end = block.position() if block.isValid() else doc.characterCount()
+        selections = []
+        for i in self.index.overlapping(start, end):
+            for s in self.match_spans(i):
+                selection = QTextEdit.ExtraSelection()
+                cursor = QTextCursor(doc)
+                cursor.setPosition(s.start)
+                cursor.setPosition(s.end, QTextCursor.KeepAnchor)
+                selection.cursor = cursor
+                selection.format = self.char_format(s)
+                selections.append(selection)
+        self.window = (start, end)
+        self.edit.setExtraSelections(selections)
+
+
+class LineIndex:
+    # wrapped (visual) line numbers of document positions - blocks are
+    # counted and their lines summed in a single forward sweep, which is
+    # only taken as far as the positions asked for, until the next re-wrap
+    def __init__(self, document):
+        self.document = document
+        self.invalidate()
+
+    def invalidate(self):
+        # wrapped lines before each block
+        self.lines = array("q")
+        self.block = self.document.firstBlock()
+        self.total = 0
+        self.wrapped = None
+        self.text = None
+        self.pos = 0
+        self.number = 0
+
+    def is_wrapped(self):
+        if self.wrapped is None:
+            doc = self.document
+            # plain text lines all have the same height, so the height of
+            # the document tells whether anything is wrapped
+            height = doc.size().height() - doc.documentMargin() * 2
+            line = doc.firstBlock().layout().lineAt(0).height()
+            lines = round(height / line) if line else 0
+            self.wrapped = lines > doc.blockCount()
+        return self.wrapped
+
+    def count(self):
+        if not self.is_wrapped():
+            return self.document.blockCount()
+        self.sweep(self.document.blockCount())
+        return self.total
+
+    def sweep(self, number):
+        lines = self.lines
+        while len(lines) <= number and self.block.isValid():
+            lines.append(self.total)
+            self.total += self.block.layout().lineCount()
+            self.block = self.block.next()
+        if len(lines) <= number:
+            lines.append(self.total)
+
+    def block_number(self, pos):
+        if self.text is None:
+            self.text = self.document.toRawText()
+        if pos < self.pos:
+            self.pos = self.number = 0
+        self.number += self.text.count("\u2029", self.pos, pos)
+        self.pos = pos
+        return self.number
+
+    def line_at(self, pos):
+        number = self.block_number(pos)
+        # nothing wrapped, so a block is always a line
+        if not self.is_wrapped():
+            return number + 1
+        self.sweep(number + 1)
+        line = self.lines[number]
+        if self.lines[number + 1] - line > 1:
+            block = self.document.findBlockByNumber(number)
+            tl = block.layout().lineForTextPosition(pos - block.position())
+            if tl.isValid():
+                line += tl.lineNumber()
+        return line + 1
 
 
 class RegexPy(QWidget):
-    RegexMatch = namedtuple("RegexMatch", "start end groups")
-    Group = namedtuple("Group", "start end index")
+    # the part of a file searched on disk shown in the editor, its byte
+    # range, the matches in it with character offsets (and the index of
+    # the first one) and the character offsets of byte offsets
+    Context = namedtuple("Context", "first last index start offsets")
+    # longer edits, e.g. loading a sample, are searched in the background
+    live_rematch_limit = 1 << 16
 
     colours = Colours()
     option_flags = {
@@ -182,14 +776,21 @@ class RegexPy(QWidget):
 
     def __init__(self):
         super().__init__()
-        self.ui = Ui_Form()
-        self.ui.setupUi(self)
+        # the phases of setting up the window, see --profile-startup
+        self.startup = Timings()
+        self.cwd = self.get_cwd()
+        with self.startup.time("ui"):
+            self.ui = Ui_Form()
+            self.ui.setupUi(self)
         self.ui.splitter.setSizes([2, 2, 25])
         self.ui.splitter.setCollapsible(0, False)
         self.ui.splitter.setCollapsible(1, False)
         self.ui.splitter.setCollapsible(2, False)
+        self.add_timing_label()
         self.set_labels_visible(False)
-        self.add_buttons()
+        with self.startup.time("buttons"):
+            self.add_buttons()
+        self.add_progress()
         self.shortcuts = []
         self.add_shortcuts()
         # changed from QPlainTextEdit - the QPTE scrollbar
@@ -200,9 +801,14 @@ class RegexPy(QWidget):
             QWidget, "qt_scrollarea_vcontainer"
         )
         self.scrollbar = vc.findChild(QScrollBar)
+        self.scrollbar.valueChanged.connect(self.on_scrolled)
         self.ui.textEditSample.setAcceptRichText(False)
         self.sample_doc = QTextDocument(self.ui.textEditSample)
         self.ui.textEditSample.setDocument(self.sample_doc)
+        self.sample_doc.contentsChange.connect(self.on_sample_edited)
+        self.highlighter = MatchHighlighter(
+            self.ui.textEditSample, self.colours, self
+        )
         self.ui.textEditSample.textChanged.connect(self.on_sample_changed)
         self.ui.plainTextEditRegex.document().contentsChange.connect(
             self.validate
@@ -219,10 +825,52 @@ class RegexPy(QWidget):
         self.ui.plainTextEditRegex.viewport().installEventFilter(self)
         self.navigation_enabled = False
         self.markers_enabled = False
-        self.cwd = self.get_cwd()
-        self.load_config()
-        if self.ui.plainTextEditRegex.toPlainText() > "":
-            self.validate()
+        # scrollbar markers drawn once, see marker_pixmap
+        self.marker_cache = ((None, None), None)
+        self.search_worker = None
+        self.pending_batches = []
+        # a sample being loaded, see load_sample, and a sample too large to
+        # edit, which is searched on disk instead
+        self.loader = None
+        self.loading_doc = None
+        # searched once loaded, see open_corpus_file
+        self.search_loaded = False
+        self.corpus_worker = None
+        self.corpus_dialog = None
+        self.export_worker = None
+        self.export_dialog = None
+        self.sample_file = None
+        self.sample_placeholder = self.ui.textEditSample.placeholderText()
+        self.mapped = None
+        self.context = None
+        # set while the window on a file on disk is filled or scrolled
+        self.moving_window = False
+        # matches of searches of samples in the editor, kept across
+        # restarts, and the key of those shown until they are stored with
+        # their marker lines, see store_results
+        self.results = ResultCache(os.path.join(self.cwd, "cache"))
+        self.results_key = None
+        self.cached_lines = None
+        self.patterns = PatternCache()
+        self.add_cache_label()
+        # the phases of the last search, see finish_timings
+        self.timings = Timings()
+        # live matching, the pattern the matches are current for and the
+        # sample edited since as (start, end, delta), see MatchStore.rematch
+        self.live_search = False
+        self.live_pattern = None
+        self.live_edit = None
+        # and the sample's text, kept up to date from the edits so that it
+        # is not read from the document again for each of them
+        self.live_text = None
+        self.live_restart = False
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.timeout.connect(self.run_live)
+        with self.startup.time("config"):
+            self.load_config()
+        # once the window is shown
+        QTimer.singleShot(0, self.load_files)
 
     def set_labels_visible(self, visible=True):
         self.ui.labelMatches.setVisible(visible)
@@ -230,8 +878,29 @@ class RegexPy(QWidget):
         self.ui.labelMatch.setVisible(visible)
         self.ui.labelGroups.setVisible(visible)
         self.ui.labelGroupsIndex.setVisible(visible)
+        self.timing_label.setVisible(visible and self.show_timings())
 
     def get_icon_colour(self):
+        # worked out from a button drawn by the style, once per style and
+        # palette - kept in the cache directory, as drawing one takes a
+        # while on starting up
+        palette = self.palette()
+        key = " ".join(
+            (
+                self.style().name(),
+                palette.color(QPalette.Button).name(),
+                palette.color(QPalette.ButtonText).name(),
+            )
+        )
+        fn = os.path.join(self.cwd, "cache", "icon_colours.json")
+        try:
+            with open(fn) as f:
+                colours = json.load(f)
+        except (OSError, ValueError):
+            colours = {}
+        c = QColor.fromString(colours.get(key, ""))
+        if c.isValid():
+            return (c, c.name())
         button = QToolButton()
         button.setFixedSize(24, 24)
         img = button.grab().toImage()
@@ -244,6 +913,13 @@ class RegexPy(QWidget):
             c = colour.darker(250)
         else:
             c = colour.lighter(250)
+        colours[key] = c.name()
+        try:
+            os.makedirs(os.path.dirname(fn), exist_ok=True)
+            with open(fn, "w") as f:
+                json.dump(colours, f, indent=1)
+        except OSError:
+            print_exc()
         return (c, c.name())
 
     def add_buttons(self):
@@ -343,12 +1019,189 @@ class RegexPy(QWidget):
             self.save_sample,
             QKeySequence(Qt.CTRL | Qt.SHIFT | Qt.Key_S),
         )
+        self.menu.addSeparator()
+        self.guarded_action = self.menu.addAction("Run in subprocess")
+        self.guarded_action.setToolTip(
+            "Stop searches that exceed the time budget set in regexpy.conf"
+        )
+        self.guarded_action.setCheckable(True)
+        self.live_action = self.menu.addAction("Live matching")
+        self.live_action.setToolTip(
+            "Keep matches current while the regex or sample is edited"
+        )
+        self.live_action.setCheckable(True)
+        self.live_action.toggled.connect(self.on_live_toggled)
+        self.disk_action = self.menu.addAction(
+            "Search file on disk",
+            self.search_file,
+            QKeySequence(Qt.CTRL | Qt.ALT | Qt.Key_O),
+        )
+        self.disk_action.setToolTip(
+            "Search a file without loading it, only the lines around the"
+            " selected match are shown"
+        )
+        self.disk_action.setEnabled(False)
+        self.corpus_action = self.menu.addAction(
+            "Search corpus", self.search_corpus
+        )
+        self.corpus_action.setToolTip(
+            "Count the matches in each file of a directory or glob"
+        )
+        self.corpus_action.setEnabled(False)
+        self.engine = "re"
+        engine_menu = self.menu.addMenu("Engine")
+        self.engine_actions = QActionGroup(engine_menu)
+        for name, engine in ENGINES.items():
+            action = engine_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(name == self.engine)
+            action.setEnabled(engine.available)
+            if not engine.available:
+                action.setToolTip(f"The {name} module is not installed")
+            self.engine_actions.addAction(action)
+        engine_menu.setToolTipsVisible(True)
+        self.engine_actions.triggered.connect(
+            lambda action: self.set_engine(action.text())
+        )
+        self.compare_action = self.menu.addAction(
+            "Compare engines", self.show_engine_comparison
+        )
+        self.compare_action.setToolTip(
+            "Time the regex on the sample with each engine and check that"
+            " they find the same matches"
+        )
+        self.compare_action.setEnabled(False)
+        self.menu.addSeparator()
+        self.menu.addAction("Load pattern set", self.load_pattern_set)
+        self.set_action = self.menu.addAction(
+            "Time pattern set", self.show_set_comparison
+        )
+        self.set_action.setToolTip(
+            "Time the single pass over the sample against each pattern of"
+            " the set on its own"
+        )
+        self.set_action.setEnabled(False)
+        self.menu.addSeparator()
+        self.export_action = self.menu.addAction(
+            "Export matches", self.save_matches
+        )
+        self.export_action.setToolTip(
+            "Write every match of the regex in the sample, with its groups,"
+            " to a JSON lines or CSV file"
+        )
+        self.export_action.setEnabled(False)
+        # (name, regex) of the patterns combined in the regex, see
+        # load_pattern_set, and the groups of those in the last search
+        self.pattern_set = []
+        self.sources = []
+        self.menu.setToolTipsVisible(True)
         hamburger_btn.set_menu(self.menu)
         self.hamburger_button = hamburger_btn
         buttons_layout.addWidget(
             hamburger_btn, 0, Qt.AlignRight | Qt.AlignVCenter
         )
 
+    def add_progress(self):
+        icon_colour = self.icon_colour.name()
+        svg_cancel = f"""
+            <svg width="128" height="128" viewBox="0 0 128 128" fill="none">
+            <path d="M32 32L96 96M96 32L32 96" stroke="{icon_colour}"
+            stroke-width="12" stroke-linecap="round"/>
+            </svg>
+        """
+        layout = self.ui.horizontalLayoutStatus
+        index = layout.indexOf(self.ui.labelGroupsIndex) + 1
+        progress_bar = QProgressBar()
+        progress_bar.setMaximumSize(200, 16)
+        progress_bar.setFormat("%v / %m chars")
+        progress_bar.setVisible(False)
+        layout.insertWidget(index, progress_bar)
+        self.progress_bar = progress_bar
+        cancel_btn = SvgButton(svg_cancel)
+        cancel_btn.setToolTip("Cancel search (Escape)")
+        cancel_btn.clicked.connect(self.cancel_search)
+        cancel_btn.setVisible(False)
+        layout.insertWidget(index + 1, cancel_btn)
+        self.cancel_button = cancel_btn
+
+    def add_cache_label(self):
+        layout = self.ui.horizontalLayoutStatus
+        label = QLabel()
+        label.setEnabled(False)
+        layout.insertWidget(layout.indexOf(self.ui.frameButtons), label)
+        self.cache_label = label
+        self.update_cache_label()
+
+    def update_cache_label(self):
+        cache = self.patterns
+        self.cache_label.setText(
+            f"Cache hits {cache.hits}, misses {cache.misses}"
+        )
+        self.cache_label.setToolTip(
+            f"Compiled patterns: {cache.hits} hits, {cache.misses} misses,"
+            f" {len(cache)}/{cache.size} cached, {cache.evictions} evicted\n"
+            f"Search results: {self.results.hits} hits,"
+            f" {self.results.misses} misses"
+        )
+
+    def add_timing_label(self):
+        layout = self.ui.horizontalLayoutStatus
+        label = QLabel()
+        label.setEnabled(False)
+        layout.insertWidget(
+            layout.indexOf(self.ui.labelMatchesCount) + 1, label
+        )
+        self.timing_label = label
+
+    def show_timings(self):
+        return self.configparser.getboolean(
+            "Execution", "timings", fallback=True
+        )
+
+    def update_timing_label(self):
+        timings = self.timings
+        self.timing_label.setText(f"({timings.summary()} ms)")
+        self.timing_label.setToolTip(
+            "Time spent in each phase of the last search, "
+            f"{timings.total() * 1000:.1f} ms in all"
+        )
+        self.timing_label.setVisible(
+            self.show_timings() and not self.ui.labelMatchesCount.isHidden()
+        )
+
+    def finish_timings(self, **info):
+        # shown next to the match count and, if a timing_log is set,
+        # appended to it as JSON
+        self.update_timing_label()
+        fn = self.configparser.get("Execution", "timing_log", fallback="")
+        if not fn:
+            return
+        # as in the [Flags] section
+        flags = ",".join(
+            f.name.lower()
+            for f in self.option_flags.values()
+            if self.pattern.flags & f
+        )
+        try:
+            self.timings.log(
+                os.path.join(self.cwd, fn),
+                pattern=self.pattern.pattern,
+                flags=flags,
+                matches=len(self.matches),
+                **info,
+            )
+        except OSError:
+            print_exc()
+
+    def get_pattern(self):
+        entry = self.patterns.get(
+            self.ui.plainTextEditRegex.toPlainText(),
+            self.get_flags(),
+            self.engine,
+        )
+        self.update_cache_label()
+        return entry
+
     def add_shortcuts(self):
         self.shortcuts = [
             QShortcut(
@@ -384,9 +1237,7 @@ class RegexPy(QWidget):
             QShortcut(
                 Qt.Key_Escape,
                 self,
-                lambda: self.enable_navigation(False)
-                if self.navigation_enabled
-                else False,
+                self.on_escape,
                 Qt.ShortcutContext.WindowShortcut,
             ),
         ]
@@ -411,6 +1262,10 @@ class RegexPy(QWidget):
             configparser.add_section("RegexFile")
         if not configparser.has_section("SampleFile"):
             configparser.add_section("SampleFile")
+        if not configparser.has_section("Execution"):
+            configparser.add_section("Execution")
+        if not configparser.has_section("Corpus"):
+            configparser.add_section("Corpus")
 
     def load_config(self):
         cp = configparser.ConfigParser(interpolation=None)
@@ -419,6 +1274,12 @@ class RegexPy(QWidget):
         self.configparser = cp
         try:
             cp.read_file(open(f"{self.cwd}/regexpy.conf"))
+            self.patterns.resize(
+                cp.getint("Execution", "pattern_cache", fallback=64)
+            )
+            self.results.size = (
+                cp.getint("Execution", "result_cache", fallback=64) << 20
+            )
             if cp.has_section("Colours"):
                 colours = cp.items("Colours")
                 for k, v in colours:
@@ -435,24 +1296,36 @@ class RegexPy(QWidget):
                 for o in flags:
                     if o in checks:
                         checks[o].setChecked(cp.getboolean("Flags", o))
-            if cp.has_option("RegexFile", "filename"):
-                fn = cp.get("RegexFile", "filename")
-                if fn:
-                    try:
-                        self.load_file(fn, self.ui.plainTextEditRegex)
-                        self.validate()
-                    except Exception:
-                        print_exc
-            if cp.has_option("SampleFile", "filename"):
-                fn = cp.get("SampleFile", "filename")
-                if fn:
-                    try:
-                        self.load_file(fn, self.ui.textEditSample)
-                    except Exception:
-                        print_exc()
+            self.guarded_action.setChecked(
+                cp.getboolean("Execution", "subprocess", fallback=False)
+            )
+            self.live_timer.setInterval(
+                cp.getint("Execution", "live_delay", fallback=300)
+            )
+            self.live_action.setChecked(
+                cp.getboolean("Execution", "live", fallback=False)
+            )
+            self.set_engine(cp.get("Execution", "engine", fallback="re"))
         except Exception:
             print_exc()
 
+    def load_files(self):
+        # the regex and sample files in the config
+        cp = self.configparser
+        with self.startup.time("regex file"):
+            fn = cp.get("RegexFile", "filename", fallback="")
+            if fn:
+                try:
+                    self.load_file(fn, self.ui.plainTextEditRegex)
+                except Exception:
+                    print_exc()
+        fn = cp.get("SampleFile", "filename", fallback="")
+        if fn:
+            try:
+                self.load_file(fn, self.ui.textEditSample)
+            except Exception:
+                print_exc()
+
     def load_file(self, filename=None, widget=None):
         if not filename:
             if self.sender().text() == "Load sample":
@@ -473,6 +1346,9 @@ class RegexPy(QWidget):
                     self.configparser.set("SampleFile", "filename", filename)
                 elif type == "regex":
                     self.configparser.set("RegexFile", "filename", filename)
+        if widget is self.ui.textEditSample:
+            self.load_sample(filename)
+            return
         f = QFile(filename)
         if f.open(QFile.OpenModeFlag.ReadOnly):
             # 'QTextStream is locale aware, and will automatically
@@ -486,6 +1362,111 @@ class RegexPy(QWidget):
             if widget is self.ui.plainTextEditRegex:
                 self.validate()
 
+    def load_sample(self, filename):
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            print_exc()
+            return
+        self.cancel_search()
+        if self.navigation_enabled:
+            self.enable_navigation(False)
+        edit = self.ui.textEditSample
+        limit = self.configparser.getfloat(
+            "Execution", "search_only_size", fallback=0
+        )
+        if limit and size > limit * (1 << 20):
+            # searched on disk, like Search file
+            self.sample_file = filename
+            edit.setPlaceholderText(
+                f"{filename} ({size / (1 << 20):.0f} MB) is searched on disk,"
+                " load another sample to edit one"
+            )
+            edit.clear()
+            edit.setReadOnly(True)
+            self.on_sample_changed()
+            return
+        # filled outside the editor, so laid out once when it is shown
+        doc = QTextDocument(edit)
+        doc.setUndoRedoEnabled(False)
+        doc.setDefaultFont(self.sample_doc.defaultFont())
+        doc.setDefaultTextOption(self.sample_doc.defaultTextOption())
+        doc.setDocumentMargin(self.sample_doc.documentMargin())
+        self.loading_doc = doc
+        loader = FileLoader(filename, size)
+        self.set_loading(True, size >> loader.shift)
+        loader.chunk_ready.connect(self.on_load_chunk)
+        loader.progress.connect(self.progress_bar.setValue)
+        loader.finished.connect(self.on_load_finished)
+        self.loader = loader
+        loader.start()
+
+    def on_load_chunk(self, text):
+        if not self.loader.cancelled:
+            cursor = QTextCursor(self.loading_doc)
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(text)
+        self.loader.inserted()
+
+    def on_load_finished(self):
+        loader = self.loader
+        self.loader = None
+        doc = self.loading_doc
+        self.loading_doc = None
+        self.set_loading(False)
+        loader.deleteLater()
+        if loader.cancelled or loader.error is not None:
+            self.search_loaded = False
+            if loader.error is not None:
+                print(f"{loader.filename}: {loader.error}", file=sys.stderr)
+            doc.deleteLater()
+            return
+        if self.sample_file is not None:
+            # kept until now so that a cancelled load leaves it in place
+            self.sample_file = None
+            self.ui.textEditSample.setPlaceholderText(self.sample_placeholder)
+            self.ui.textEditSample.setReadOnly(False)
+        doc.setUndoRedoEnabled(True)
+        doc.contentsChange.connect(self.on_sample_edited)
+        old = self.sample_doc
+        self.sample_doc = doc
+        self.highlighter.set_index()
+        self.ui.textEditSample.setDocument(doc)
+        old.deleteLater()
+        self.set_position()
+        self.ui.textEditSample.setFocus()
+        self.on_sample_changed()
+        if self.search_loaded:
+            self.search_loaded = False
+            self.test_pattern()
+        elif self.live_action.isChecked():
+            # a new sample, so searched afresh
+            self.live_pattern = None
+            self.live_text = None
+            self.live_timer.start()
+
+    def set_loading(self, loading, length=0):
+        self.progress_bar.setRange(0, length)
+        self.progress_bar.setFormat("%p%")
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(loading)
+        self.cancel_button.setToolTip(
+            "Cancel loading (Escape)" if loading else "Cancel search (Escape)"
+        )
+        self.cancel_button.setVisible(loading)
+        # Escape, as in set_searching
+        if loading:
+            self.shortcuts[5].setEnabled(True)
+        elif not self.navigation_enabled:
+            self.shortcuts[5].setEnabled(False)
+        self.ui.textEditSample.setReadOnly(
+            loading or self.sample_file is not None
+        )
+        self.search_button.setEnabled(not loading)
+        self.hamburger_button.setEnabled(not loading)
+        if not loading:
+            self.on_sample_changed()
+
     def save_regex(self):
         name = strftime("regex_%Y%m%d_%H%M%S.txt")
         fn = QFileDialog.getSaveFileName(
@@ -505,7 +1486,28 @@ class RegexPy(QWidget):
             self.configparser.set("SampleFile", "filename", fn)
 
     def closeEvent(self, event):
+        if self.search_worker is not None:
+            self.cancel_search()
+            self.search_worker.wait(2000)
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader.wait(2000)
+        if self.corpus_worker is not None:
+            self.corpus_worker.cancel()
+            self.corpus_worker.wait(2000)
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.export_worker.wait(2000)
         self.save_flags()
+        self.configparser.set(
+            "Execution",
+            "subprocess",
+            str(int(self.guarded_action.isChecked())),
+        )
+        self.configparser.set(
+            "Execution", "live", str(int(self.live_action.isChecked()))
+        )
+        self.configparser.set("Execution", "engine", self.engine)
         self.configparser.write(open(f"{self.cwd}/regexpy.conf", mode="w"))
 
     def enable_navigation(self, enabled=False):
@@ -517,10 +1519,17 @@ class RegexPy(QWidget):
             self.sample_scroll_pos = (
                 self.ui.textEditSample.verticalScrollBar().sliderPosition()
             )
-            self.ui.textEditSample.setDocument(
-                self.ui.textEditSample.document().clone(self.ui.textEditSample)
-            )
-            self.lines = self.ui.textEditSample.document().lineCount()
+            if self.mapped is None:
+                # the sample is only made read-only, the highlighter's extra
+                # selections are painted over it and dropped afterwards
+                self.highlighter.set_index(self.matches)
+            else:
+                # filled by show_context
+                self.ui.textEditSample.setDocument(
+                    QTextDocument(self.ui.textEditSample)
+                )
+                self.context = None
+            self.line_index = LineIndex(self.ui.textEditSample.document())
             self.ui.textEditSample.setReadOnly(True)
             self.ui.textEditSample.verticalScrollBar().setSliderPosition(0)
             self.navigate(Move.NextMatch)
@@ -538,11 +1547,15 @@ class RegexPy(QWidget):
                 self.shortcuts[5].setEnabled(True)
             self.hamburger_button.setEnabled(False)
         else:
+            self.cancel_search()
             self.navigation_enabled = False
             self.clear_regex_selection()
-            self.ui.textEditSample.setDocument(self.sample_doc)
+            if self.ui.textEditSample.document() is not self.sample_doc:
+                # the context of a match in a file on disk
+                self.ui.textEditSample.setDocument(self.sample_doc)
+            self.highlighter.set_index()
             self.ui.textEditSample.setCurrentCharFormat(QTextCharFormat())
-            self.ui.textEditSample.setReadOnly(False)
+            self.ui.textEditSample.setReadOnly(self.sample_file is not None)
             self.ui.textEditSample.viewport().setCursor(Qt.IBeamCursor)
             self.set_position(pos=self.sample_cursor_pos)
             self.ui.textEditSample.verticalScrollBar().setSliderPosition(
@@ -560,31 +1573,91 @@ class RegexPy(QWidget):
             for s in self.shortcuts:
                 s.setEnabled(False)
             self.hamburger_button.setEnabled(True)
+            self.release_file()
+            if self.live_action.isChecked():
+                self.live_timer.start()
 
     def validate(self):
         p = self.ui.plainTextEditRegex.toPlainText()
         if p != "":
-            try:
-                self.pattern = re.compile(p)
-                is_valid = True
-            except re.error:
-                is_valid = False
-            if is_valid:
+            entry = self.get_pattern()
+            if entry.error is None:
                 c = self.colours.regex_valid.name()
-                self.expression = Expression(self.pattern)
+                self.pattern = entry.pattern
+                self.expression = entry.expression
+                self.show_risks(p, self.get_flags())
                 self.menu.actions()[3].setEnabled(True)
+                self.disk_action.setEnabled(True)
+                self.corpus_action.setEnabled(True)
+                self.export_action.setEnabled(True)
+                self.set_action.setEnabled(self.is_pattern_set(entry.pattern))
                 self.search_button.setEnabled(True)
             else:
                 c = self.colours.regex_invalid.name()
+                self.ui.plainTextEditRegex.setExtraSelections([])
+                self.ui.plainTextEditRegex.setToolTip(str(entry.error))
                 self.menu.actions()[3].setEnabled(False)
+                self.disk_action.setEnabled(False)
+                self.corpus_action.setEnabled(False)
+                self.export_action.setEnabled(False)
+                self.set_action.setEnabled(False)
                 self.search_button.setEnabled(False)
             ss = f"QPlainTextEdit {{ color: {c}; }}"
             self.ui.plainTextEditRegex.setStyleSheet(ss)
         else:
             self.ui.plainTextEditRegex.setStyleSheet(None)
+            self.ui.plainTextEditRegex.setExtraSelections([])
+            self.ui.plainTextEditRegex.setToolTip("")
+        # other engines may accept what this one does not
+        self.compare_action.setEnabled(p != "")
         if self.navigation_enabled:
             self.enable_navigation(False)
-        self.set_labels_visible(False)
+        if self.live_action.isChecked():
+            self.live_timer.start()
+        else:
+            self.set_labels_visible(False)
+
+    def show_risks(self, pattern, flags):
+        # sub-expressions prone to catastrophic backtracking are underlined
+        # and listed in the tooltip
+        edit = self.ui.plainTextEditRegex
+        if not ENGINES[self.engine].backtracking:
+            edit.setExtraSelections([])
+            edit.setToolTip(f"Backtracking: none, {self.engine} is linear")
+            return
+        try:
+            analysis = analyse(pattern, flags)
+        except re.error:
+            # syntax only the engine knows
+            edit.setExtraSelections([])
+            edit.setToolTip("")
+            return
+        except Exception:
+            print_exc()
+            edit.setExtraSelections([])
+            edit.setToolTip("")
+            return
+        selections = []
+        for f in analysis.findings:
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setUnderlineStyle(
+                QTextCharFormat.UnderlineStyle.WaveUnderline
+            )
+            selection.format.setUnderlineColor(self.colours.regex_risk)
+            cursor = edit.textCursor()
+            cursor.setPosition(f.start, QTextCursor.MoveMode.MoveAnchor)
+            cursor.setPosition(f.end, QTextCursor.MoveMode.KeepAnchor)
+            selection.cursor = cursor
+            selections.append(selection)
+        edit.setExtraSelections(selections)
+        lines = [
+            "Backtracking: "
+            + describe(analysis.complexity, analysis.degree)
+            + ("" if analysis.complexity == LINEAR else " in the worst case")
+        ]
+        for f in analysis.findings:
+            lines.append(f"{describe(f.complexity, f.degree)}: {f.message}")
+        edit.setToolTip("\n".join(lines))
 
     def get_flags(self):
         flags = 0
@@ -615,82 +1688,74 @@ class RegexPy(QWidget):
         tc.clearSelection()
         self.ui.plainTextEditRegex.setTextCursor(tc)
 
-    def colour_text(self, start, end, foreground, background, underline=False):
-        cursor = self.ui.textEditSample.textCursor()
-        cf = QTextCharFormat()
-        cf.setForeground(foreground)
-        if underline:
-            cf.setUnderlineColor(self.colours.match_background)
-            cf.setUnderlineStyle(QTextCharFormat.SingleUnderline)
-        cursor.setPosition(start, QTextCursor.MoveMode.MoveAnchor)
-        bgc = cursor.charFormat().background().color()
-        if background:
-            if bgc == background:
-                background = background.darker(150)
-            cf.setBackground(background)
-        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
-        cursor.setCharFormat(cf)
-
-    def colour_matches(self, matches):
-        self.match_lines = []
-        for m in matches:
-            self.colour_text(
-                m.start,
-                m.end,
-                self.colours.match_foreground,
-                self.colours.match_background,
-            )
-            m_len = m.start - m.end
-            g_total = 0
-            for g in m.groups:
-                g_total += g.start - g.end
-            if g_total == m_len:
-                underline = True
-            else:
-                underline = False
-            for g in m.groups:
-                if g.end > g.start:
-                    self.colour_text(
-                        g.start,
-                        g.end,
-                        self.colours.group_foreground,
-                        self.colours.group_background,
-                        underline,
-                    )
-            app.processEvents()
-            self.match_lines.append(self.get_line_at_position(m.start))
+    def colour_matches(self):
+        c = self.context
+        if c is not None and len(c.index) != len(
+            self.matches.overlapping(c.first, c.last)
+        ):
+            # matches found in the window on a file on disk since, it is
+            # filled again with the same text so the current match stays
+            # selected where it was
+            edit = self.ui.textEditSample
+            cursor = edit.textCursor()
+            anchor, position = cursor.anchor(), cursor.position()
+            sb = edit.verticalScrollBar()
+            value = sb.value()
+            self.show_window(c.first, c.last)
+            self.moving_window = True
+            cursor = edit.textCursor()
+            cursor.setPosition(anchor)
+            cursor.setPosition(position, QTextCursor.KeepAnchor)
+            edit.setTextCursor(cursor)
+            sb.setValue(value)
+            self.moving_window = False
+        self.highlighter.update()
 
-    # https://stackoverflow.com/questions/15814776 thanks to Marek R
     def get_line_at_position(self, pos):
-        cursor = self.ui.textEditSample.textCursor()
-        cursor.setPosition(pos)
-        cursor.movePosition(QTextCursor.StartOfLine)
-        lines = 1
-        while cursor.positionInBlock() > 0:
-            cursor.movePosition(QTextCursor.Up)
-            lines += 1
-        block = cursor.block().previous()
-        while block.isValid():
-            lines += block.lineCount()
-            block = block.previous()
+        return self.line_index.line_at(pos)
+
+    def get_match_lines(self):
+        lines = self.match_lines
+        if len(lines) == len(self.matches):
+            return lines
+        if self.cached_lines is not None:
+            cached, self.cached_lines = self.cached_lines, None
+            # wrapped lines depend on the width of the editor
+            if not self.line_index.is_wrapped():
+                self.match_lines = cached
+                return cached
+        with self.timings.time("lines"):
+            for start in self.matches.starts[len(lines) :]:  # noqa: E203
+                lines.append(self.get_line_at_position(start))
+        if self.search_worker is None:
+            # markers shown after the search
+            self.update_timing_label()
+            if self.results_key is not None:
+                self.store_results()
         return lines
 
+    def invalidate_lines(self):
+        self.line_index.invalidate()
+        self.match_lines = []
+
     def find_match(self, p):
-        gi = -1
-        for mi, m in enumerate(self.matches):
-            if len(m.groups):
-                for i in range(len(m.groups) - 1, -1, -1):
-                    g = m.groups[i]
-                    if g.start == g.end:
-                        continue
-                    elif p > g.start and p <= g.end:
-                        gi = i
-                        return (mi, gi)
-            if p >= m.start and p <= m.end:
-                return (mi, gi)
-        return (-1, -1)
+        # (-1, -1) unless p is after the start of a match
+        if self.mapped is None:
+            index = self.matches
+        else:
+            index = self.context.index
+        mi, gi = index.find(p)
+        if mi < 0 or p <= index.start(mi):
+            return (-1, -1)
+        if self.mapped is not None:
+            mi += self.context.start
+        return (mi, gi)
 
     def select_group(self, g):
+        if g.start < 0:
+            # not located in the pattern, see Expression
+            self.clear_regex_selection()
+            return
         cursor = self.ui.plainTextEditRegex.textCursor()
         cursor.setPosition(g.start, QTextCursor.MoveMode.MoveAnchor)
         cursor.setPosition(g.end + 1, QTextCursor.MoveMode.KeepAnchor)
@@ -722,34 +1787,36 @@ class RegexPy(QWidget):
                 if pos.x() > cr1.x():
                     cfp.movePosition(QTextCursor.NextCharacter)
                 cr2 = self.ui.textEditSample.cursorRect(cfp)
-                bbs = cfp.charFormat().background().style()
-                if cr2.y() > cr1.y() or bbs == Qt.NoBrush:
+                p = cfp.position()
+                mi, gi = self.find_match(p)
+                if cr2.y() > cr1.y() or mi < 0:
                     self.ui.labelMatch.hide()
                     self.ui.labelGroups.hide()
                     self.ui.labelGroupsIndex.hide()
                     self.clear_regex_selection()
                 else:
-                    mi, gi = self.find_match(cfp.position())
-                    if mi >= 0:
-                        self.ui.labelMatch.setText(f"[{mi + 1}]")
-                        self.ui.labelMatch.show()
-                        if gi >= 0:
-                            self.ui.labelGroups.show()
-                            self.ui.labelGroupsIndex.show()
-                            cap = self.expression.capturing[gi]
-                            self.select_group(cap)
-                            self.ui.labelGroupsIndex.setText(
-                                cap.name if cap.name else str(gi + 1)
-                            )
-                        else:
-                            self.ui.labelGroups.hide()
-                            self.ui.labelGroupsIndex.hide()
-                            self.clear_regex_selection()
+                    self.ui.labelMatch.setText(self.match_label(mi, gi))
+                    self.ui.labelMatch.show()
+                    if gi >= 0:
+                        self.ui.labelGroups.show()
+                        self.ui.labelGroupsIndex.show()
+                        cap = self.expression.capturing[gi]
+                        self.select_group(cap)
+                        self.ui.labelGroupsIndex.setText(
+                            cap.name if cap.name else str(gi + 1)
+                        )
+                    else:
+                        self.ui.labelGroups.hide()
+                        self.ui.labelGroupsIndex.hide()
+                        self.clear_regex_selection()
         elif widget is self.ui.textEditSample.viewport():
             if event.type() is QEvent.MouseButtonPress:
                 if self.navigation_enabled:
                     self.enable_navigation(False)
                     return True
+            elif event.type() is QEvent.Resize and self.navigation_enabled:
+                if event.size().width() != event.oldSize().width():
+                    self.invalidate_lines()
         elif widget is self.ui.plainTextEditRegex.viewport():
             if self.ui.plainTextEditRegex.isReadOnly():
                 if event.type() in (
@@ -767,55 +1834,678 @@ class RegexPy(QWidget):
 
     def draw_markers(self):
         qp = QPainter(self.scrollbar)
-        qp.setPen(QPen(Qt.NoPen))
-        qp.setBrush(self.icon_colour)
-        qp.setOpacity(0.25)
-        btn_h = self.scrollbar.width() + 4
+        qp.drawPixmap(0, 0, self.marker_pixmap())
+
+    def marker_pixmap(self):
+        # match_lines is replaced whenever the results or the wrapping change,
+        # so the pixmap is only drawn again for those, for more lines from a
+        # running search and for a resized scrollbar. A file on disk is
+        # marked by byte offset, with the window shown on it
+        if self.mapped is None:
+            lines = self.get_match_lines()
+            total = self.line_index.count()
+            window = None
+        else:
+            lines = self.matches.starts
+            total = max(len(self.mapped), 1)
+            c = self.context
+            window = None if c is None else (c.first, c.last)
+        sb = self.scrollbar
+        dpr = sb.devicePixelRatioF()
+        key = (len(lines), sb.width(), sb.height(), dpr, window)
+        (cached, cached_key), pixmap = self.marker_cache
+        if cached is lines and cached_key == key:
+            return pixmap
+        pixmap = QPixmap(sb.size() * dpr)
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+        btn_h = sb.width() + 4
         if app.platformName() == "cocoa":
             m = 1
         else:
             m = 2
-        for ml in self.match_lines:
-            f = ml / self.lines
-            trk_h = self.scrollbar.height() - (btn_h * 2 * m)
-            trk_pos = round((trk_h * f) + (btn_h * m))
-            mw = round(self.scrollbar.width() / 3)
-            qp.drawRect(mw, trk_pos, mw, 3)
+        trk_h = sb.height() - (btn_h * 2 * m)
+        top = btn_h * m
+        # matches per pixel of the track
+        hits = [0] * (sb.height() + 3)
+        for ml in lines:
+            y = round(trk_h * ml / total + top)
+            if 0 <= y < len(hits):
+                hits[y] += 1
+        # a marker is 3 pixels high and as dark as the busiest pixel it covers
+        rows = [
+            max(hits[max(y - 2, 0) : y + 1])  # noqa: E203
+            for y in range(len(hits))
+        ]
+        most = max(rows, default=0)
+        qp = QPainter(pixmap)
+        qp.setPen(QPen(Qt.NoPen))
+        qp.setBrush(self.icon_colour)
+        mw = round(sb.width() / 3)
+        if window is not None:
+            y = round(trk_h * window[0] / total + top)
+            h = max(round(trk_h * (window[1] - window[0]) / total), 2)
+            qp.setOpacity(0.5)
+            qp.drawRect(0, y, 2, h)
+        if most:
+            scale = 0.75 / math.log2(most) if most > 1 else 0
+            for y, n in enumerate(rows):
+                if n:
+                    # a lone match as before, the busiest ones opaque
+                    qp.setOpacity(0.25 + scale * math.log2(n))
+                    qp.drawRect(mw, y, mw, 1)
+        qp.end()
+        self.marker_cache = ((lines, key), pixmap)
+        return pixmap
 
     def toggle_markers(self):
         self.markers_enabled = not self.markers_enabled
+        if self.markers_enabled:
+            # markers are drawn for every match
+            self.more_matches(everything=True)
         self.scrollbar.repaint()
 
-    def matchmaker(self, match: re.Match):
-        groups = []
-        for i in range(1, len(match.groups()) + 1):
-            group = self.Group(match.start(i), match.end(i), i)
-            groups.append(group)
-        return self.RegexMatch(match.start(), match.end(), groups)
-
     def test_pattern(self):
-        self.pattern = re.compile(
-            self.ui.plainTextEditRegex.toPlainText(),
-            self.get_flags(),
+        if self.search_worker is not None:
+            return
+        if self.sample_file is not None:
+            self.search_path(self.sample_file)
+            return
+        timings = Timings()
+        with timings.time("compile"):
+            entry = self.get_pattern()
+        if entry.error is not None:
+            return
+        self.timings = timings
+        self.pattern = entry.pattern
+        self.expression = entry.expression
+        if (
+            entry.pattern is self.live_pattern
+            and self.live_edit is None
+            and len(self.matches)
+        ):
+            # the live matches are current
+            self.current_match = -1
+            self.current_group = -1
+            self.match_lines = []
+            with timings.time("navigation"):
+                self.enable_navigation(True)
+            self.finish_timings(
+                sample=len(self.sample_doc.toPlainText()), state="live"
+            )
+            return
+        text = self.ui.textEditSample.toPlainText()
+        key = None
+        if self.results.size > 0:
+            with timings.time("cache"):
+                key = self.results.key(
+                    text, self.pattern.pattern, self.get_flags(), self.engine
+                )
+                cached = self.results.get(key)
+            self.update_cache_label()
+            if cached is not None:
+                self.restore_results(key, text, *cached)
+                return
+        self.start_search(
+            self.pattern, text, self.get_budget(len(text)), key=key
         )
-        res = self.pattern.finditer(self.ui.textEditSample.toPlainText())
-        matches = []
-        for m in res:
-            matches.append(self.matchmaker(m))
-        self.matches = matches
+
+    def restore_results(self, key, text, store, lines):
+        # the matches of the same search made before, navigated at once
+        self.set_sources(self.pattern)
+        self.results_key = key
+        self.live_search = False
+        self.live_pattern = None
+        self.matches = store
+        self.match_lines = []
+        self.current_match = -1
+        self.current_group = -1
         self.ui.labelMatches.show()
-        self.ui.labelMatchesCount.setText(str(len(matches)))
+        self.ui.labelMatchesCount.setText(str(len(store)))
         self.ui.labelMatchesCount.show()
-        if len(matches) > 0:
-            self.current_match = -1
-            self.current_group = -1
-            self.enable_navigation(True)
-            pos = matches[0].start
-            self.scroll_to_pos(pos, Move.NextMatch)
-            self.colour_matches(matches)
+        # used by get_match_lines unless the sample is wrapped, which is
+        # only known once it has all been laid out
+        self.cached_lines = lines
+        if lines is not None:
+            self.results_key = None
+        if len(store):
+            with self.timings.time("navigation"):
+                self.enable_navigation(True)
+        self.show_source_counts()
+        self.finish_timings(sample=len(text), state="cached")
+
+    def store_results(self):
+        lines = self.match_lines
+        if (
+            not len(self.matches)
+            or len(lines) != len(self.matches)
+            or self.line_index.is_wrapped()
+        ):
+            lines = None
+        try:
+            self.results.put(self.results_key, self.matches, lines)
+        except OSError:
+            print_exc()
+        if lines is not None or not len(self.matches):
+            # nothing more to store
+            self.results_key = None
+
+    def search_file(self):
+        if self.search_worker is not None:
+            return
+        fn = QFileDialog.getOpenFileName(
+            self, "RegexPy - choose file to search"
+        )[0]
+        if fn:
+            self.search_path(fn)
+
+    def search_corpus(self):
+        if self.corpus_worker is not None:
+            return
+        entry = self.get_pattern()
+        if entry.error is not None:
+            return
+        cp = self.configparser
+        spec, ok = QInputDialog.getText(
+            self,
+            "RegexPy - search corpus",
+            "Directory or glob, e.g. logs/**/*.log",
+            text=cp.get("Corpus", "path", fallback=""),
+        )
+        if not ok or not spec:
+            return
+        paths = corpus_files(os.path.expanduser(spec))
+        if not paths:
+            QMessageBox.information(
+                self, "RegexPy - search corpus", f"No files in {spec}"
+            )
+            return
+        cp.set("Corpus", "path", spec)
+        jobs = cp.getint("Execution", "corpus_jobs", fallback=0)
+        worker = CorpusWorker(
+            entry.pattern, paths, jobs or min(len(paths), os.cpu_count() or 1)
+        )
+        dialog = CorpusDialog(spec, paths, self)
+        dialog.open_file.connect(self.open_corpus_file)
+        dialog.button.clicked.connect(self.close_corpus)
+        dialog.rejected.connect(self.cancel_corpus)
+        worker.result_ready.connect(dialog.add_result)
+        worker.finished.connect(self.on_corpus_finished)
+        if self.corpus_dialog is not None:
+            self.corpus_dialog.deleteLater()
+        self.corpus_dialog = dialog
+        self.corpus_worker = worker
+        dialog.show()
+        worker.start()
+
+    def cancel_corpus(self):
+        if self.corpus_worker is not None:
+            self.corpus_worker.cancel()
+
+    def close_corpus(self):
+        if self.corpus_worker is not None:
+            self.corpus_worker.cancel()
+        else:
+            self.corpus_dialog.close()
+
+    def on_corpus_finished(self):
+        worker = self.corpus_worker
+        self.corpus_worker = None
+        self.corpus_dialog.set_done(worker.cancelled)
+        worker.deleteLater()
+
+    def open_corpus_file(self, path):
+        # loaded into the sample editor and searched as usual
+        if self.loader is not None:
+            return
+        self.configparser.set("SampleFile", "filename", path)
+        self.search_loaded = True
+        self.load_sample(path)
+        if self.loader is None:
+            # not loaded, e.g. searched on disk
+            self.search_loaded = False
+            self.test_pattern()
+
+    def save_matches(self):
+        if self.export_worker is not None:
+            return
+        entry = self.get_pattern()
+        if entry.error is not None:
+            return
+        fn, selected = QFileDialog.getSaveFileName(
+            self,
+            "RegexPy - export matches",
+            "",
+            "JSON lines (*.jsonl);;CSV (*.csv)",
+        )
+        if not fn:
+            return
+        fmt = "csv" if selected.startswith("CSV") else "jsonl"
+        if fn.lower().endswith((".csv", ".jsonl")):
+            fmt = fn.lower().rpartition(".")[2]
+        # group names as in the CLI's JSON output, by group number
+        names = {
+            i + 1: g.name for i, g in enumerate(entry.expression.capturing)
+        }
+        mapped = None
+        if self.sample_file is not None:
+            # a file too large to edit is exported from disk
+            try:
+                mapped = MappedFile(self.sample_file)
+                pattern = mapped.compile(
+                    entry.pattern.pattern, self.get_flags(), self.engine
+                )
+            except (OSError, ValueError, re.error):
+                print_exc()
+                if mapped is not None:
+                    mapped.close()
+                return
+            text = mapped.buffer
+        else:
+            pattern = entry.pattern
+            text = self.sample_doc.toPlainText()
+        # found as a search would be, large samples in a subprocess
+        worker = ExportWorker(
+            pattern,
+            text,
+            fn,
+            fmt,
+            names,
+            self.get_budget(len(text)),
+            mapped,
+        )
+        worker.mapped = mapped
+        dialog = QProgressDialog(
+            f"Exporting matches to {os.path.basename(fn)}",
+            "Cancel",
+            0,
+            len(text) >> worker.shift,
+            self,
+        )
+        dialog.setWindowTitle("RegexPy - export matches")
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.canceled.connect(worker.cancel)
+        worker.progress.connect(dialog.setValue)
+        worker.finished.connect(self.on_export_finished)
+        self.export_worker = worker
+        self.export_dialog = dialog
+        worker.start()
+
+    def on_export_finished(self):
+        worker = self.export_worker
+        self.export_worker = None
+        # closing the dialog would cancel the worker
+        self.export_dialog.canceled.disconnect(worker.cancel)
+        self.export_dialog.close()
+        self.export_dialog.deleteLater()
+        self.export_dialog = None
+        stopped = None
+        if worker.scan is not None:
+            stopped = self.scan_stopped(worker.scan.status, len(worker.text))
+        if worker.mapped is not None:
+            worker.mapped.close()
+        if worker.error is not None:
+            QMessageBox.warning(self, "RegexPy - export matches", worker.error)
+        else:
+            status = ""
+            if worker.cancelled:
+                status = " (cancelled)"
+            elif stopped:
+                status = f" {stopped}"
+            QMessageBox.information(
+                self,
+                "RegexPy - export matches",
+                f"{worker.count} matches written to {worker.filename}{status}",
+            )
+        worker.deleteLater()
+
+    def search_path(self, fn):
+        timings = Timings()
+        with timings.time("compile"):
+            entry = self.get_pattern()
+        if entry.error is not None:
+            return
+        self.timings = timings
+        self.pattern = entry.pattern
+        self.expression = entry.expression
+        try:
+            mapped = MappedFile(fn)
+        except OSError:
+            print_exc()
+            return
+        try:
+            with timings.time("compile"):
+                pattern = mapped.compile(
+                    self.pattern.pattern, self.get_flags(), self.engine
+                )
+        except (ValueError, re.error):
+            print_exc()
+            mapped.close()
+            return
+        self.mapped = mapped
+        # a subprocess maps the file itself
+        self.start_search(
+            pattern, mapped.buffer, self.get_budget(len(mapped)), source=mapped
+        )
+
+    def start_search(
+        self, pattern, text, budget=None, live=False, key=None, source=None
+    ):
+        self.set_sources(pattern)
+        self.results_key = key
+        self.cached_lines = None
+        self.live_search = live
+        self.live_pattern = None
+        self.matches = MatchStore(pattern.groups)
+        self.match_lines = []
+        self.current_match = -1
+        self.current_group = -1
+        self.ui.labelMatches.show()
+        self.ui.labelMatchesCount.setText("0")
+        self.ui.labelMatchesCount.show()
+        # live matches are not navigated, so fetched all at once
+        page_size = 0 if live else self.get_page_size()
+        worker = MatchWorker(pattern, text, budget, page_size, source)
+        self.set_searching(True, len(text) >> worker.shift)
+        if live:
+            self.highlighter.set_index(self.matches)
+        worker.batch_ready.connect(self.on_match_batch)
+        worker.progress.connect(self.progress_bar.setValue)
+        worker.finished.connect(self.on_search_finished)
+        self.search_worker = worker
+        worker.start()
+
+    def get_page_size(self):
+        return self.configparser.getint("Execution", "page_size", fallback=1000)
+
+    def more_matches(self, everything=False):
+        if self.search_worker is not None:
+            self.search_worker.more(everything)
+
+    def get_budget(self, size=0):
+        cp = self.configparser
+        if not self.guarded_action.isChecked():
+            # large samples are searched in a subprocess anyway, without
+            # a budget, so that the GUI is not held up
+            limit = cp.getfloat("Execution", "subprocess_size", fallback=16)
+            if limit and size > limit * (1 << 20):
+                return (0, 0)
+            return None
+        timeout = cp.getfloat("Execution", "timeout", fallback=10.0)
+        cpu_limit = cp.getint("Execution", "cpu_limit", fallback=0)
+        return (timeout, cpu_limit)
+
+    def set_searching(self, searching, length=0):
+        self.progress_bar.setRange(0, length)
+        self.progress_bar.setFormat(
+            "%v / %m chars" if self.mapped is None else "%p%"
+        )
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(searching)
+        self.cancel_button.setVisible(searching)
+        if searching:
+            self.shortcuts[5].setEnabled(True)
+        elif self.navigation_enabled:
+            self.shortcuts[5].setEnabled(len(self.expression.capturing) > 0)
+        if not self.navigation_enabled and not self.live_search:
+            self.ui.textEditSample.setReadOnly(
+                searching or self.sample_file is not None
+            )
+            self.ui.plainTextEditRegex.setReadOnly(searching)
+            self.search_button.setEnabled(not searching)
+            self.hamburger_button.setEnabled(not searching)
+            if not searching:
+                self.shortcuts[5].setEnabled(False)
+
+    def cancel_search(self):
+        if self.loader is not None:
+            self.loader.cancel()
+        if self.search_worker is not None:
+            self.search_worker.cancel()
+
+    def on_match_batch(self, batch):
+        # navigate() processes events, so batches can arrive while an
+        # earlier one is still being handled - queue them up instead,
+        # None marks the end of the search
+        self.pending_batches.append(batch)
+        if len(self.pending_batches) > 1:
+            return
+        while self.pending_batches:
+            batch = self.pending_batches[0]
+            if batch is None:
+                self.finish_search()
+            elif not self.search_worker.cancelled:
+                first = not self.matches
+                with self.timings.time("store"):
+                    self.matches.extend(batch)
+                # more to come, or at least not ruled out yet
+                self.ui.labelMatchesCount.setText(f"{len(self.matches)}+")
+                if self.configparser.getboolean(
+                    "Execution", "prefetch", fallback=False
+                ):
+                    # the next page is asked for once the queued events,
+                    # e.g. this batch, have been handled
+                    QTimer.singleShot(0, self.more_matches)
+                if first and not self.live_search:
+                    with self.timings.time("navigation"):
+                        self.enable_navigation(True)
+                        self.shortcuts[5].setEnabled(True)
+                        self.scroll_to_pos(
+                            self.matches.starts[0], Move.NextMatch
+                        )
+                with self.timings.time("highlight"):
+                    self.colour_matches()
+            self.pending_batches.pop(0)
+
+    def on_search_finished(self):
+        self.on_match_batch(None)
+
+    def scan_stopped(self, status, length):
+        # why a scan in a subprocess ended early, None if it did not
+        if status is None or status.state == "complete":
+            return None
+        reason = {
+            "timeout": "time budget exceeded",
+            "cpu": "CPU budget exceeded",
+        }.get(status.state, "subprocess failed")
+        return (
+            f"({reason} at {status.offset}/{length}"
+            f" after {status.elapsed:.1f}s)"
+        )
+
+    def finish_search(self):
+        worker = self.search_worker
+        self.search_worker = None
+        count = str(len(self.matches))
+        status = worker.scan.status if worker.scan is not None else None
+        stopped = self.scan_stopped(status, len(worker.text))
+        if worker.cancelled:
+            count += " (cancelled)"
+        elif stopped:
+            count += f"+ {stopped}"
+        self.ui.labelMatchesCount.setText(count)
+        self.show_source_counts()
+        self.set_searching(False)
+        # the worker's scan went on in parallel with the other phases
+        self.timings.add("scan", worker.scan_time)
+        if worker.cancelled:
+            state = "cancelled"
+        else:
+            state = status.state if status is not None else "complete"
+        self.finish_timings(
+            sample=len(worker.text),
+            file=self.mapped.filename if self.mapped is not None else None,
+            live=self.live_search,
+            state=state,
+        )
+        if self.results_key is not None:
+            if state == "complete":
+                self.store_results()
+            else:
+                self.results_key = None
+        if self.live_search:
+            self.live_search = False
+            if not worker.cancelled and (
+                status is None or status.state == "complete"
+            ):
+                self.live_pattern = worker.pattern
+            if self.live_edit is not None or self.live_restart:
+                # catch up with edits made meanwhile
+                self.live_restart = False
+                self.live_timer.start()
+        if self.navigation_enabled and self.mapped is not None:
             self.ui.textEditSample.setDocument(
                 self.ui.textEditSample.document()
             )
+        worker.deleteLater()
+        self.release_file()
+
+    def release_file(self):
+        # the mapping is in use until both the search and navigation end
+        if self.search_worker is None and not self.navigation_enabled:
+            if self.mapped is not None:
+                self.mapped.close()
+                self.mapped = None
+                self.context = None
+
+    def on_scrolled(self):
+        # scrolling past the last match fetched asks for another page,
+        # with a file on disk the window on it is moved instead
+        if self.mapped is not None:
+            if (
+                self.navigation_enabled
+                and self.context is not None
+                and not self.moving_window
+            ):
+                self.move_window()
+            return
+        worker = self.search_worker
+        if (
+            not self.navigation_enabled
+            or worker is None
+            or not worker.is_paused()
+        ):
+            return
+        edit = self.ui.textEditSample
+        bottom = edit.verticalScrollBar().value() + edit.viewport().height()
+        if self.highlighter.position_at(bottom) >= self.matches.ends[-1]:
+            worker.more()
+
+    def on_live_toggled(self, checked):
+        if checked:
+            self.live_timer.start()
+            return
+        self.live_timer.stop()
+        self.live_pattern = None
+        self.live_edit = None
+        self.live_text = None
+        if self.live_search:
+            self.cancel_search()
+        if not self.navigation_enabled:
+            self.highlighter.set_index()
+            self.set_labels_visible(False)
+
+    def on_sample_edited(self, pos, removed, added):
+        if not self.live_action.isChecked():
+            return
+        if self.live_edit is None:
+            start, end, delta = pos, pos + added, added - removed
+        else:
+            # both edits as one, after this one
+            start, end, delta = self.live_edit
+            start = min(start, pos)
+            end = max(end, pos + removed) + added - removed
+            delta += added - removed
+        self.live_edit = (start, end, delta)
+        if self.live_text is not None:
+            doc = self.sample_doc
+            length = doc.characterCount() - 1
+            cursor = QTextCursor(doc)
+            cursor.setPosition(min(pos, length))
+            cursor.setPosition(min(pos + added, length), QTextCursor.KeepAnchor)
+            text = self.live_text
+            text = (
+                text[:pos]
+                + cursor.selectedText().translate(PLAIN_TEXT)
+                + text[pos + removed :]  # noqa: E203
+            )
+            # read from the document again if the edit was misreported
+            self.live_text = text if len(text) == length else None
+        self.live_timer.start()
+
+    def run_live(self):
+        if (
+            not self.live_action.isChecked()
+            or self.navigation_enabled
+            or self.mapped is not None
+            or self.sample_file is not None
+        ):
+            return
+        entry = None
+        if self.ui.plainTextEditRegex.toPlainText():
+            entry = self.get_pattern()
+        worker = self.search_worker
+        if worker is not None:
+            # finish_search runs this again
+            if entry is None or entry.pattern is not worker.pattern:
+                self.live_restart = True
+                self.cancel_search()
+            return
+        if entry is None or entry.error is not None:
+            self.live_pattern = None
+            self.live_edit = None
+            self.highlighter.set_index()
+            self.set_labels_visible(False)
+            return
+        edit = self.live_edit
+        self.live_edit = None
+        text = self.live_text
+        if (
+            entry.pattern is not self.live_pattern
+            or text is None
+            or (
+                edit is not None and edit[1] - edit[0] > self.live_rematch_limit
+            )
+        ):
+            text = self.ui.textEditSample.toPlainText()
+            self.live_text = text
+            self.timings = Timings()
+            self.pattern = entry.pattern
+            self.expression = entry.expression
+            self.start_search(
+                entry.pattern, text, self.get_budget(len(text)), True
+            )
+            return
+        if edit is None:
+            # nothing to match again, e.g. back from navigation, so the
+            # timings of the last search stand
+            self.highlighter.set_index(self.matches)
+        else:
+            self.timings = Timings()
+            with self.timings.time("rematch"):
+                self.matches.rematch(entry.pattern, text, *edit)
+            with self.timings.time("highlight"):
+                self.highlighter.set_index(self.matches)
+        self.ui.labelMatches.show()
+        self.ui.labelMatchesCount.setText(str(len(self.matches)))
+        self.ui.labelMatchesCount.show()
+        self.show_source_counts()
+        if edit is not None:
+            self.finish_timings(sample=len(text), live=True, state="rematch")
+
+    def on_escape(self):
+        worker = self.search_worker
+        if self.loader is not None or (
+            worker is not None
+            and not worker.cancelled
+            and not worker.is_paused()
+        ):
+            self.cancel_search()
+        elif self.navigation_enabled:
+            # a search paused between pages has stopped already, the pages
+            # not fetched yet are dropped with navigation
+            self.enable_navigation(False)
 
     def scroll_to_pos(self, pos, move):
         self.set_position(pos=pos)
@@ -877,7 +2567,7 @@ class RegexPy(QWidget):
         match = self.matches[self.current_match]
         if self.current_group < 0:
             pos = match.start
-            self.ui.labelMatch.setText(f"[{self.current_match + 1}]")
+            self.ui.labelMatch.setText(self.match_label(self.current_match))
             self.ui.labelMatch.show()
             self.ui.labelGroups.hide()
             self.ui.labelGroupsIndex.hide()
@@ -888,7 +2578,9 @@ class RegexPy(QWidget):
                 self.navigate(move)
                 return
             pos = g.start
-            self.ui.labelMatch.setText(f"[{self.current_match + 1}]")
+            self.ui.labelMatch.setText(
+                self.match_label(self.current_match, self.current_group)
+            )
             self.ui.labelMatch.show()
             self.ui.labelGroups.show()
             cap = self.expression.capturing[self.current_group]
@@ -897,7 +2589,110 @@ class RegexPy(QWidget):
             )
             self.ui.labelGroupsIndex.show()
             self.select_group(cap)
+        if self.mapped is not None:
+            pos = self.show_context(pos)
+            # the window only moves when scrolled by hand
+            self.moving_window = True
         self.scroll_to_pos(pos, move)
+        self.moving_window = False
+        # the next page is fetched before navigation runs out of matches
+        worker = self.search_worker
+        if (
+            worker is not None
+            and len(self.matches) - self.current_match <= worker.page_size // 2
+        ):
+            worker.more()
+
+    def match_label(self, mi, gi=-1):
+        label = f"[{mi + 1}]"
+        if self.sources:
+            # the pattern of the set which matched
+            i = source_of(self.matches[mi].groups, self.sources)
+            label += f" {self.pattern_set[i][0]}"
+        if self.mapped is not None:
+            # line number and byte offsets in the file
+            m = self.matches[mi]
+            span = m if gi < 0 else m.groups[gi]
+            line = self.mapped.lines.line_at(span.start)
+            label += f" line {line}, {span.start}-{span.end}"
+        return label
+
+    def show_context(self, pos):
+        # a file searched on disk is never loaded, the editor only holds a
+        # window of lines around the current match, returns pos in it
+        m = self.matches[self.current_match]
+        if self.context is None or not (
+            self.context.first <= m.start and m.end <= self.context.last
+        ):
+            self.show_window(*self.mapped.context(m.start, m.end))
+        return self.window_offset(pos)
+
+    def window_offset(self, pos):
+        # character offset in the window of byte offset pos
+        c = self.context
+        pos = min(max(pos, c.first), c.last)
+        if pos not in c.offsets:
+            c.offsets.update(self.mapped.decode(c.first, pos, [pos])[1])
+        return c.offsets[pos]
+
+    def show_window(self, first, last):
+        store = self.matches
+        indexes = store.overlapping(first, last)
+        width = 2 * store.groups
+        regs = array("q")
+        for i in indexes:
+            j = i * width
+            regs.append(store.starts[i])
+            regs.append(store.ends[i])
+            regs.extend(store.spans[j : j + width])  # noqa: E203
+
+        def clip(p):
+            return min(max(p, first), last)
+
+        positions = [clip(p) for p in regs if p >= 0]
+        positions += (first, last)
+        text, offsets = self.mapped.decode(first, last, positions)
+        index = MatchStore(store.groups)
+        index.extend(
+            array("q", (offsets[clip(p)] if p >= 0 else -1 for p in regs))
+        )
+        self.context = self.Context(first, last, index, indexes.start, offsets)
+        self.moving_window = True
+        self.ui.textEditSample.setPlainText(text)
+        self.moving_window = False
+        self.highlighter.set_index(index)
+        if self.markers_enabled:
+            # the window is marked on the scrollbar
+            self.scrollbar.update()
+
+    def move_window(self):
+        # scrolling to the top or bottom of the window moves it up or down
+        # the file, keeping the line at the edge where it is
+        c = self.context
+        sb = self.ui.textEditSample.verticalScrollBar()
+        if sb.value() >= sb.maximum() and c.last < len(self.mapped):
+            anchor = c.last
+        elif sb.value() <= sb.minimum() and c.first > 0:
+            anchor = c.first
+        else:
+            return
+        edit = self.ui.textEditSample
+        y = edit.cursorRect(self.text_cursor(self.window_offset(anchor))).y()
+        self.show_window(*self.mapped.context(anchor, anchor))
+        cr = edit.cursorRect(self.text_cursor(self.window_offset(anchor)))
+        self.moving_window = True
+        sb.setValue(sb.value() + cr.y() - y)
+        self.moving_window = False
+        # matches past the last page fetched are wanted now
+        worker = self.search_worker
+        if worker is not None and worker.is_paused():
+            if not len(self.matches) or self.matches.ends[-1] < c.last:
+                worker.more()
+
+    def text_cursor(self, pos):
+        cursor = QTextCursor(self.ui.textEditSample.document())
+        cursor.setPosition(pos)
+        return cursor
 
     def on_sample_changed(self):
         if not self.navigation_enabled:
@@ -906,15 +2701,210 @@ class RegexPy(QWidget):
                 self.search_button.setEnabled(True)
             else:
                 self.menu.actions()[4].setEnabled(False)
-                self.search_button.setEnabled(False)
+                self.search_button.setEnabled(self.sample_file is not None)
+
+    def set_engine(self, name):
+        if name not in ENGINES or not ENGINES[name].available:
+            name = "re"
+        for action in self.engine_actions.actions():
+            action.setChecked(action.text() == name)
+        if name != self.engine:
+            self.engine = name
+            self.on_checkbox_clicked()
+
+    def load_pattern_set(self):
+        fns = QFileDialog.getOpenFileNames(
+            self, "RegexPy - choose the regex files of a pattern set"
+        )[0]
+        sources = []
+        for fn in fns:
+            try:
+                with open(fn, encoding="utf-8") as f:
+                    source = f.read().removesuffix("\n")
+            except (OSError, UnicodeDecodeError):
+                print_exc()
+                continue
+            name = pattern_name(fn, {n for n, _ in sources})
+            sources.append((name, source))
+        if not sources:
+            return
+        combined, skipped = combine_patterns(
+            sources, self.get_flags(), self.engine
+        )
+        if skipped:
+            QMessageBox.warning(
+                self,
+                "RegexPy - pattern set",
+                "Left out of the pattern set:\n\n"
+                + "\n".join(f"{name}: {reason}" for name, reason in skipped),
+            )
+        left_out = {name for name, _ in skipped}
+        self.pattern_set = [s for s in sources if s[0] not in left_out]
+        if combined:
+            self.ui.plainTextEditRegex.setPlainText(combined)
+
+    def is_pattern_set(self, pattern):
+        # whether the regex is still the combination of the pattern set
+        groups = pattern.groupindex
+        return bool(self.pattern_set) and all(
+            name in groups for name, _ in self.pattern_set
+        )
+
+    def set_sources(self, pattern):
+        self.sources = []
+        colours = {}
+        if self.is_pattern_set(pattern):
+            self.sources = [pattern.groupindex[n] for n, _ in self.pattern_set]
+            # the match colour with its hue turned for each pattern
+            h, s, v, a = self.colours.match_background.getHsv()
+            count = len(self.sources)
+            for i, gid in enumerate(self.sources):
+                hue = (h + 360 * i // count) % 360
+                colours[gid] = QColor.fromHsv(hue, min(s, 160), 255, a)
+        self.highlighter.set_sources(colours)
+
+    def show_source_counts(self):
+        # matches of each pattern of the set, next to the match count
+        tip = ""
+        if self.sources:
+            tip = "\n".join(
+                f"{name}: {self.matches.participating(gid)}"
+                for (name, _), gid in zip(self.pattern_set, self.sources)
+            )
+        self.ui.labelMatchesCount.setToolTip(tip)
+
+    def show_set_comparison(self):
+        names = [name for name, _ in self.pattern_set]
+        sources = [source for _, source in self.pattern_set]
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            run = compare_pattern_set(
+                self.pattern,
+                names,
+                sources,
+                self.get_flags(),
+                self.sample_doc.toPlainText(),
+                self.engine,
+            )
+        finally:
+            QApplication.restoreOverrideCursor()
+        rows = [
+            f"<td>{name}</td><td align='right'>{combined}</td>"
+            f"<td align='right'>{alone}</td>"
+            f"<td align='right'>{seconds * 1000:.2f}</td>"
+            for name, combined, alone, seconds in zip(
+                run.names, run.combined, run.alone, run.times
+            )
+        ]
+        header = "".join(
+            f"<th>{h}</th>"
+            for h in ("Pattern", "Single pass", "Alone", "Alone ms")
+        )
+        body = "".join(f"<tr>{r}</tr>" for r in rows)
+        separate = sum(run.times)
+        box = QMessageBox(self)
+        box.setWindowTitle("RegexPy - pattern set")
+        box.setTextFormat(Qt.RichText)
+        box.setText(
+            f"<table cellspacing='0' cellpadding='4'><tr>{header}</tr>"
+            f"{body}</table><p>Single pass {run.single * 1000:.2f} ms,"
+            f" each pattern on its own {separate * 1000:.2f} ms in all.</p>"
+            "<p>The single pass finds the leftmost match of any pattern, so"
+            " matches which overlap one found first are not counted.</p>"
+        )
+        box.exec()
+
+    def show_engine_comparison(self):
+        pattern = self.ui.plainTextEditRegex.toPlainText()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            runs = compare_engines(
+                pattern, self.get_flags(), self.sample_doc.toPlainText()
+            )
+        finally:
+            QApplication.restoreOverrideCursor()
+        rows = []
+        reference = None
+        for run in runs:
+            if run.error is not None:
+                result = run.error
+            elif reference is None:
+                reference = run.engine
+                result = "reference"
+            elif run.difference is None:
+                result = f"same matches as {reference}"
+            else:
+                result = (
+                    f"differs from {reference} at match {run.difference + 1}"
+                )
+            cells = [run.engine]
+            if run.error is None:
+                cells += [
+                    f"{run.compile_time * 1000:.2f}",
+                    f"{run.search_time * 1000:.2f}",
+                    str(run.count),
+                ]
+            else:
+                cells += ["", "", ""]
+            cells.append(result.replace("&", "&amp;").replace("<", "&lt;"))
+            rows.append("".join(f"<td>{c}</td>" for c in cells))
+        header = "".join(
+            f"<th>{h}</th>"
+            for h in ("Engine", "Compile ms", "Search ms", "Matches", "")
+        )
+        body = "".join(f"<tr>{r}</tr>" for r in rows)
+        box = QMessageBox(self)
+        box.setWindowTitle("RegexPy - compare engines")
+        box.setTextFormat(Qt.RichText)
+        box.setText(
+            f"<table cellspacing='0' cellpadding='4'><tr>{header}</tr>"
+            f"{body}</table>"
+        )
+        box.exec()
 
     def on_checkbox_clicked(self):
-        if self.navigation_enabled:
-            self.enable_navigation(False)
+        self.cancel_search()
+        # validity can depend on the flags, e.g. verbose
+        self.validate()
+
+
+def print_startup(widget, startup, shown):
+    # once the files in the config have been loaded, the sample in the
+    # background
+    if "regex file" not in widget.startup.phases or widget.loader is not None:
+        QTimer.singleShot(1, lambda: print_startup(widget, startup, shown))
+        return
+    regex_file = widget.startup.phases["regex file"]
+    startup.add("regex file", regex_file)
+    startup.add("sample file", perf_counter() - shown - regex_file)
+    for phase, seconds in startup.phases.items():
+        print(f"{phase:<12} {seconds * 1000:8.1f} ms", file=sys.stderr)
+    print(f"{'total':<12} {startup.total() * 1000:8.1f} ms", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    app = QApplication()
+    if getattr(sys, "frozen", False):
+        # processes spawned by a frozen build start here
+        import multiprocessing
+
+        multiprocessing.freeze_support()
+    if sys.argv[1:2] == ["--batch"]:
+        from regexpy_cli import main
+
+        sys.exit(main(sys.argv[2:]))
+    startup = Timings()
+    startup.add("imports", perf_counter() - STARTED)
+    with startup.time("application"):
+        app = QApplication()
+    start = perf_counter()
     regexpy = RegexPy()
-    regexpy.show()
+    window = perf_counter() - start
+    for phase, seconds in regexpy.startup.phases.items():
+        startup.add(phase, seconds)
+    # the rest of the window's set up
+    startup.add("widgets", window - regexpy.startup.total())
+    with startup.time("show"):
+        regexpy.show()
+    if "--profile-startup" in sys.argv[1:]:
+        print_startup(regexpy, startup, perf_counter())
     app.exec()
@@ -0,0 +1,279 @@
+import argparse
+import configparser
+import json
+import multiprocessing
+import os
+import re
+import sys
+from traceback import print_exc
+
+from regexpy_engine import (
+    ENGINES,
+    Expression,
+    compare_engines,
+    compile_pattern,
+    matchmaker,
+)
+
+STDIN = "(standard input)"
+
+
+def get_cwd():
+    # same location as the GUI, next to the executable when frozen
+    if getattr(sys, "frozen", False):
+        return os.path.realpath(os.path.dirname(sys.executable))
+    return os.path.realpath(os.path.dirname(__file__))
+
+
+def load_config(filename):
+    cp = configparser.ConfigParser(interpolation=None)
+    cp.optionxform = str
+    try:
+        cp.read_file(open(filename))
+    except FileNotFoundError:
+        pass
+    except Exception:
+        print_exc()
+    return cp
+
+
+def parse_flags(names):
+    # [Flags] options and --flags use the lower case names of the re flags
+    flags = 0
+    for name in names:
+        flag = getattr(re.RegexFlag, name.strip().upper(), None)
+        if not isinstance(flag, re.RegexFlag):
+            raise ValueError(f"unknown flag {name!r}")
+        flags |= flag
+    return flags
+
+
+def config_flags(cp):
+    if not cp.has_section("Flags"):
+        return 0
+    names = [o for o in cp.options("Flags") if cp.getboolean("Flags", o)]
+    return parse_flags(names)
+
+
+def escape(text):
+    return text.encode("unicode_escape").decode("ascii")
+
+
+def format_match(path, m, names, text, as_json):
+    groups = [(g, names.get(g.index)) for g in m.groups if g.start >= 0]
+    if as_json:
+        record = {
+            "file": path,
+            "start": m.start,
+            "end": m.end,
+            "match": text[m.start : m.end],  # noqa: E203
+            "groups": [
+                {
+                    "index": g.index,
+                    "name": name,
+                    "start": g.start,
+                    "end": g.end,
+                    "text": text[g.start : g.end],  # noqa: E203
+                }
+                for g, name in groups
+            ],
+        }
+        return json.dumps(record, ensure_ascii=False)
+    span = escape(text[m.start : m.end])  # noqa: E203
+    lines = [f"{path}:{m.start}-{m.end}:{span}"]
+    for g, name in groups:
+        label = name or g.index
+        span = escape(text[g.start : g.end])  # noqa: E203
+        lines.append(f"\t{label}:{g.start}-{g.end}:{span}")
+    return "\n".join(lines)
+
+
+def read_sample(path, encoding):
+    if path == STDIN:
+        return sys.stdin.read()
+    with open(path, encoding=encoding, errors="replace") as f:
+        return f.read()
+
+
+def search(pattern, path, text, as_json):
+    # group names as shown by the GUI, indexed like match.regs
+    expression = Expression(pattern)
+    names = {i + 1: g.name for i, g in enumerate(expression.capturing)}
+    for match in pattern.finditer(text):
+        yield format_match(path, matchmaker(match), names, text, as_json)
+
+
+def search_file(job):
+    # runs in a pool worker, the output of a file is returned in one go so
+    # that files are not interleaved on stdout
+    pattern, path, encoding, as_json = job
+    try:
+        text = read_sample(path, encoding)
+    except (OSError, LookupError) as e:
+        return None, f"{path}: {e}"
+    return list(search(pattern, path, text, as_json)), None
+
+
+def compare(pattern, path, text, as_json):
+    # one line per engine, the first to compile is the reference
+    lines = []
+    reference = None
+    same = True
+    for run in compare_engines(pattern.pattern, pattern.flags, text):
+        if run.error is None and reference is None:
+            reference = run.engine
+        elif run.error is None:
+            same = same and run.difference is None
+        if as_json:
+            lines.append(json.dumps(dict(run._asdict(), file=path)))
+        elif run.error is not None:
+            lines.append(f"{path}:{run.engine}:{run.error}")
+        else:
+            result = "reference" if run.engine == reference else "same"
+            if run.difference is not None:
+                result = f"differs at match {run.difference + 1}"
+            lines.append(
+                f"{path}:{run.engine}:compile {run.compile_time * 1000:.2f}"
+                f" ms, search {run.search_time * 1000:.2f} ms,"
+                f" {run.count} matches, {result}"
+            )
+    return lines, same
+
+
+def write(lines):
+    found = False
+    for line in lines:
+        print(line)
+        found = True
+    return found
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="regexpy",
+        description="Search files with a regular expression, without the "
+        "GUI. The pattern and flags default to those saved by RegexPy.",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("-e", "--regexp", help="regular expression")
+    source.add_argument(
+        "-f",
+        "--file",
+        help="file holding the regular expression (default: [RegexFile] "
+        "filename in the config)",
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        default=os.path.join(get_cwd(), "regexpy.conf"),
+        help="config file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--flags",
+        help="comma separated re flags, e.g. ignorecase,multiline "
+        "(default: [Flags] in the config)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of files searched in parallel (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="write one JSON object per match",
+    )
+    parser.add_argument("--encoding", help="encoding of the sample files")
+    parser.add_argument(
+        "--engine",
+        choices=list(ENGINES),
+        default="re",
+        help="regex engine, regex and re2 if installed (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--compare-engines",
+        action="store_true",
+        help="time each engine on the samples and check that they find the"
+        " same matches, the exit status is 1 if they do not",
+    )
+    parser.add_argument(
+        "samples",
+        nargs="*",
+        metavar="FILE",
+        help="sample files, standard input if none or -",
+    )
+    return parser
+
+
+def get_pattern(args, cp):
+    if args.regexp is not None:
+        source = args.regexp
+    else:
+        fn = args.file or cp.get("RegexFile", "filename", fallback="")
+        if not fn:
+            raise ValueError("no regular expression given or saved")
+        with open(fn) as f:
+            source = f.read()
+    if args.flags is not None:
+        flags = parse_flags(n for n in args.flags.split(",") if n.strip())
+    else:
+        flags = config_flags(cp)
+    return compile_pattern(source, flags, args.engine)
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    cp = load_config(args.config)
+    try:
+        pattern = get_pattern(args, cp)
+    except (OSError, ValueError, re.error) as e:
+        parser.error(str(e))
+    samples = [STDIN if s == "-" else s for s in args.samples] or [STDIN]
+    found = False
+    failed = False
+    if args.compare_engines:
+        same = True
+        for path in samples:
+            try:
+                text = read_sample(path, args.encoding)
+            except (OSError, LookupError) as e:
+                print(f"regexpy: {path}: {e}", file=sys.stderr)
+                failed = True
+                continue
+            lines, agree = compare(pattern, path, text, args.json)
+            write(lines)
+            same = same and agree
+        return 2 if failed else 0 if same else 1
+    try:
+        if len(samples) == 1 or args.jobs <= 1 or STDIN in samples:
+            # matches are written as they are found
+            for path in samples:
+                try:
+                    text = read_sample(path, args.encoding)
+                except (OSError, LookupError) as e:
+                    print(f"regexpy: {path}: {e}", file=sys.stderr)
+                    failed = True
+                    continue
+                found |= write(search(pattern, path, text, args.json))
+        else:
+            jobs = [(pattern, s, args.encoding, args.json) for s in samples]
+            with multiprocessing.Pool(min(args.jobs, len(jobs))) as pool:
+                for lines, error in pool.imap(search_file, jobs):
+                    if error:
+                        print(f"regexpy: {error}", file=sys.stderr)
+                        failed = True
+                    else:
+                        found |= write(lines)
+    except BrokenPipeError:
+        # e.g. piped into head
+        sys.stderr.close()
+        return 0 if found else 1
+    return 2 if failed else 0 if found else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
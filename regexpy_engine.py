@@ -0,0 +1,1233 @@
+import csv
+import glob
+import hashlib
+import importlib.util
+import json
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from itertools import chain
+from time import monotonic, perf_counter, sleep, strftime
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# atomic groups are new in Python 3.11
+ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# stands in for re.Match where only the spans survive, e.g. when
+# matches are passed back from another process
+SpanMatch = namedtuple("SpanMatch", "regs")
+RegexMatch = namedtuple("RegexMatch", "start end groups")
+Group = namedtuple("Group", "start end index")
+
+
+def matchmaker(match: re.Match):
+    regs = match.regs
+    groups = []
+    for i in range(1, len(regs)):
+        group = Group(regs[i][0], regs[i][1], i)
+        groups.append(group)
+    return RegexMatch(regs[0][0], regs[0][1], groups)
+
+
+class Engine:
+    # a regex module used through re's interface - compile raises
+    # re.error, also for what the module does not support, and the
+    # matches found have re's regs
+    name = "re"
+    # whether matching backtracks, see regexpy_redos
+    backtracking = True
+
+    def __init__(self, module_name):
+        self.module_name = module_name
+
+    @property
+    def available(self):
+        # found without importing it
+        if "module" in self.__dict__:
+            return self.module is not None
+        return importlib.util.find_spec(self.module_name) is not None
+
+    @cached_property
+    def module(self):
+        # imported when first used rather than with this module, which
+        # would slow down starting the GUI
+        try:
+            return importlib.import_module(self.module_name)
+        except ImportError:
+            return None
+
+    def compile(self, pattern, flags=0):
+        return re.compile(pattern, flags)
+
+    def regs(self, match, groups):
+        return match.regs
+
+
+class RegexEngine(Engine):
+    # the third-party regex module, in its re compatible mode
+    name = "regex"
+
+    def compile(self, pattern, flags=0):
+        if self.module is None:
+            raise re.error("the regex module is not installed")
+        module_flags = self.module.VERSION0
+        for flag in re.RegexFlag:
+            if flags & flag:
+                module_flags |= getattr(self.module, flag.name)
+        try:
+            compiled = self.module.compile(pattern, module_flags)
+        except self.module.error as e:
+            raise re.error(str(e)) from None
+        return EnginePattern(self, compiled, pattern, flags)
+
+
+class RE2Engine(Engine):
+    # RE2 matches in linear time, but has no backreferences or
+    # lookarounds and its \d, \w and \s are always ASCII
+    name = "re2"
+    backtracking = False
+    inline_flags = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s"}
+
+    def compile(self, pattern, flags=0):
+        if self.module is None:
+            raise re.error("the re2 module is not installed")
+        if flags & (re.VERBOSE | re.LOCALE):
+            raise re.error("re2 does not support the VERBOSE or LOCALE flags")
+        inline = "".join(c for f, c in self.inline_flags.items() if flags & f)
+        if inline:
+            prefix = f"(?{inline})"
+            if isinstance(pattern, bytes):
+                prefix = prefix.encode()
+            source = prefix + pattern
+        else:
+            source = pattern
+        options = self.module.Options()
+        options.log_errors = False
+        try:
+            compiled = self.module.compile(source, options)
+        except self.module.error as e:
+            message = e.args[0] if e.args else ""
+            if isinstance(message, bytes):
+                message = message.decode(errors="replace")
+            raise re.error(f"not supported by re2: {message}") from None
+        return EnginePattern(self, compiled, pattern, flags)
+
+    def regs(self, match, groups):
+        return tuple(match.span(i) for i in range(groups + 1))
+
+
+class EnginePattern:
+    # a pattern compiled by another engine, with the attributes of
+    # re.Pattern the searches use, its flags are re's
+    def __init__(self, engine, compiled, pattern, flags):
+        self.engine = engine
+        self.compiled = compiled
+        self.pattern = pattern
+        self.flags = flags
+        self.groups = compiled.groups
+        self.groupindex = dict(compiled.groupindex)
+
+    def finditer(self, text, pos=0, endpos=None):
+        if endpos is None:
+            endpos = len(text)
+        regs = self.engine.regs
+        for m in self.compiled.finditer(text, pos, endpos):
+            yield SpanMatch(regs(m, self.groups))
+
+    def __reduce__(self):
+        # compiled again when unpickled, e.g. in a pool worker
+        return (compile_pattern, (self.pattern, self.flags, self.engine.name))
+
+
+ENGINES = {
+    e.name: e
+    # re2 is the google-re2 package
+    for e in (Engine("re"), RegexEngine("regex"), RE2Engine("re2"))
+}
+
+
+def compile_pattern(pattern, flags=0, engine="re"):
+    return ENGINES[engine].compile(pattern, flags)
+
+
+def engine_of(pattern):
+    return getattr(pattern, "engine", ENGINES["re"])
+
+
+# the time taken to compile and search, the number of matches found, the
+# error compiling (e.g. an unsupported construct) and the index of the
+# first match which differs from those of the first engine, None if none
+EngineRun = namedtuple(
+    "EngineRun", "engine compile_time search_time count error difference"
+)
+
+
+def compare_engines(pattern, flags, text, engines=None):
+    runs = []
+    baseline = None
+    for engine in engines or ENGINES.values():
+        if not engine.available:
+            runs.append(EngineRun(engine.name, 0, 0, 0, "not installed", None))
+            continue
+        start = perf_counter()
+        try:
+            compiled = engine.compile(pattern, flags)
+        except re.error as e:
+            runs.append(
+                EngineRun(
+                    engine.name, perf_counter() - start, 0, 0, str(e), None
+                )
+            )
+            continue
+        compiled_at = perf_counter()
+        regs = array("q")
+        for m in compiled.finditer(text):
+            regs.extend(chain.from_iterable(m.regs))
+        searched = perf_counter()
+        width = 2 * (compiled.groups + 1)
+        difference = None
+        if baseline is None:
+            baseline = (regs, width)
+        elif (regs, width) != baseline:
+            difference = first_difference(baseline, (regs, width))
+        runs.append(
+            EngineRun(
+                engine.name,
+                compiled_at - start,
+                searched - compiled_at,
+                len(regs) // width,
+                None,
+                difference,
+            )
+        )
+    return runs
+
+
+def first_difference(a, b):
+    # index of the first match which differs between two flattened regs
+    (regs_a, width), (regs_b, width_b) = a, b
+    if width != width_b:
+        return 0
+    count = min(len(regs_a), len(regs_b)) // width
+    for i in range(count):
+        j = i * width
+        if regs_a[j : j + width] != regs_b[j : j + width]:  # noqa: E203
+            return i
+    return count
+
+
+class GroupState(sre_parse.State):
+    # parser state which also records where each capturing group opens and
+    # closes in the pattern source
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+        self.spans = {}
+
+    def opengroup(self, name=None):
+        gid = super().opengroup(name)
+        # the group's "(" or "(?P<name>" has just been read
+        self.spans[gid] = [self.str.rfind("(", 0, self.source.tell()), None]
+        return gid
+
+    def closegroup(self, gid, p):
+        super().closegroup(gid, p)
+        # and now its ")"
+        self.spans[gid][1] = self.source.tell() - 1
+
+
+@lru_cache(maxsize=256)
+def parse_groups(pattern, flags=0):
+    # the capturing groups of pattern, as parsed by re itself, so escaped
+    # brackets, character classes, comments and verbose whitespace are
+    # read as re reads them
+    source = sre_parse.Tokenizer(pattern)
+    state = GroupState(source)
+    state.flags = flags
+    state.str = pattern
+    sre_parse._parse_sub(source, state, flags & re.VERBOSE, 0)
+    names = {gid: name for name, gid in state.groupdict.items()}
+    groups = []
+    # enclosing groups, groups are numbered in the order they open
+    open_groups = []
+    for gid in range(1, state.groups):
+        start, end = state.spans[gid]
+        while open_groups and open_groups[-1].end < start:
+            open_groups.pop()
+        group = Expression.PatternGroup(
+            len(open_groups),
+            start,
+            end,
+            True,
+            names.get(gid),
+            gid,
+            open_groups[-1].index if open_groups else 0,
+        )
+        groups.append(group)
+        open_groups.append(group)
+    return tuple(groups)
+
+
+class Expression:
+    @dataclass(frozen=True)
+    class PatternGroup:
+        # start and end are the offsets of the group's brackets in the
+        # pattern, parent is the index of the enclosing group, 0 for none
+        level: int
+        start: int
+        end: int
+        capturing: bool = True
+        name: str = None
+        index: int = 0
+        parent: int = 0
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        try:
+            self.groups = parse_groups(pattern.pattern, pattern.flags)
+        except re.error:
+            # syntax only another engine knows, its groups are numbered
+            # but cannot be located in the pattern
+            names = {i: name for name, i in pattern.groupindex.items()}
+            self.groups = tuple(
+                self.PatternGroup(0, -1, -1, True, names.get(i), i)
+                for i in range(1, pattern.groups + 1)
+            )
+        self.capturing = [g for g in self.groups if g.capturing]
+
+
+class PatternCache:
+    # compiled patterns with their groups, or the error compiling them,
+    # keyed on (pattern, flags) - the least recently used are evicted once
+    # there are more than size
+    Entry = namedtuple("Entry", "pattern expression error")
+
+    def __init__(self, size=64):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, pattern, flags=0, engine="re"):
+        key = (pattern, flags, engine)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        try:
+            compiled = ENGINES[engine].compile(pattern, flags)
+            entry = self.Entry(compiled, Expression(compiled), None)
+        except re.error as e:
+            entry = self.Entry(None, None, e)
+        self.entries[key] = entry
+        self.evict()
+        return entry
+
+    def resize(self, size):
+        self.size = size
+        self.evict()
+
+    def evict(self):
+        while len(self.entries) > max(self.size, 0):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+class Timings:
+    # seconds spent in each phase of a search, in the order they were
+    # first timed - a phase timed again, e.g. per batch, adds up
+    def __init__(self):
+        self.phases = {}
+        self.started = strftime("%Y-%m-%dT%H:%M:%S")
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def time(self, phase):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, perf_counter() - start)
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def summary(self):
+        return ", ".join(
+            f"{phase} {seconds * 1000:.1f}"
+            for phase, seconds in self.phases.items()
+        )
+
+    def record(self, **info):
+        return dict(
+            time=self.started,
+            **info,
+            phases={p: round(s, 6) for p, s in self.phases.items()},
+            total=round(self.total(), 6),
+        )
+
+    def log(self, filename, **info):
+        # one JSON object per line, appended
+        with open(filename, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.record(**info), ensure_ascii=False))
+            f.write("\n")
+
+
+# layout of the ring buffer shared with the scanning process: a header
+# of counters followed by fixed width records, one per match holding
+# the flattened match.regs
+WRITTEN, READ, DONE, HEADER = 0, 1, 2, 3
+RING_SIZE = 1 << 20
+
+
+def scan(pattern, flags, text, shared, cpu_limit=0, engine="re"):
+    if cpu_limit and resource is not None:
+        hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, hard))
+    buf = memoryview(shared).cast("B").cast("q")
+    if isinstance(text, MappedFile):
+        text = text.buffer
+    compiled = ENGINES[engine].compile(pattern, flags)
+    width = 2 * (compiled.groups + 1)
+    capacity = (len(buf) - HEADER) // width
+    written = 0
+    # every match is published as soon as it is found, if the next one
+    # never turns up the parent still has everything up to that point
+    for m in compiled.finditer(text):
+        while written - buf[READ] >= capacity:
+            sleep(0.001)
+        i = HEADER + (written % capacity) * width
+        j = i + width
+        buf[i:j] = array("q", chain.from_iterable(m.regs))
+        written += 1
+        buf[WRITTEN] = written
+    buf[DONE] = 1
+
+
+class GuardedScan:
+    # runs finditer in a child process which is killed when the wall clock
+    # budget (timeout) is exceeded, the CPU budget is enforced by the OS
+    Status = namedtuple("Status", "state elapsed offset")
+
+    poll_interval = 0.02
+
+    def __init__(
+        self, pattern, flags, text, timeout=0, cpu_limit=0, engine="re"
+    ):
+        self.pattern = pattern
+        self.flags = flags
+        self.engine = engine
+        self.text = text
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.cancelled = False
+        self.status = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __iter__(self):
+        # imported on first use, it slows down starting the GUI
+        import multiprocessing
+
+        # not fork - the parent is running Qt threads
+        ctx = multiprocessing.get_context("spawn")
+        shared = ctx.RawArray("q", RING_SIZE)
+        buf = memoryview(shared).cast("B").cast("q")
+        compiled = ENGINES[self.engine].compile(self.pattern, self.flags)
+        width = 2 * (compiled.groups + 1)
+        capacity = (len(buf) - HEADER) // width
+        process = ctx.Process(
+            target=scan,
+            args=(
+                self.pattern,
+                self.flags,
+                self.text,
+                shared,
+                self.cpu_limit,
+                self.engine,
+            ),
+            daemon=True,
+        )
+        start = monotonic()
+        read = 0
+        offset = 0
+        state = "complete"
+        process.start()
+        try:
+            while True:
+                if self.cancelled:
+                    state = "cancelled"
+                    break
+                if self.timeout and monotonic() - start >= self.timeout:
+                    state = "timeout"
+                    break
+                done = buf[DONE]
+                exitcode = process.exitcode
+                written = buf[WRITTEN]
+                while read < written:
+                    i = HEADER + (read % capacity) * width
+                    spans = buf[i : i + width]  # noqa: E203
+                    regs = tuple(zip(spans[::2], spans[1::2]))
+                    offset = regs[0][1]
+                    read += 1
+                    buf[READ] = read
+                    suspended = monotonic()
+                    yield SpanMatch(regs)
+                    # time spent by the consumer, e.g. paused until more
+                    # matches are wanted, is not part of the budget
+                    start += monotonic() - suspended
+                if done:
+                    break
+                if exitcode is not None:
+                    # killed by SIGXCPU when over the CPU budget
+                    state = "cpu" if self.cpu_limit else "error"
+                    break
+                if read == written:
+                    sleep(self.poll_interval)
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            self.status = self.Status(state, monotonic() - start, offset)
+
+
+@lru_cache(maxsize=256)
+def lookaround_reach(pattern, flags=0):
+    # how far outside its own span a match can look, through lookarounds
+    # and the one character anchors like \b look at, added up so nested
+    # ones are covered. Unbounded, as MAXREPEAT, when it cannot be told
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, TypeError, RecursionError):
+        return sre_parse.MAXREPEAT
+    return min(reach_of(parsed), sre_parse.MAXREPEAT)
+
+
+def reach_of(node):
+    if isinstance(node, sre_parse.SubPattern):
+        node = node.data
+    if not isinstance(node, (tuple, list)):
+        return 0
+    if node and node[0] is sre_parse.AT:
+        return 1
+    if node and (
+        node[0] is sre_parse.ASSERT or node[0] is sre_parse.ASSERT_NOT
+    ):
+        sub = node[1][1]
+        return sub.getwidth()[1] + reach_of(sub)
+    return sum(reach_of(n) for n in node)
+
+
+class MatchStore:
+    # the matches from one search in flat arrays rather than objects, the
+    # start and end offsets of the matches and a matches x groups x 2
+    # matrix of group spans, about 16 bytes per span. finditer never
+    # returns overlapping matches so starts and ends are both sorted and
+    # positions can be looked up with a binary search.
+    # An edit moves every match after it, so rather than all of their
+    # offsets being rewritten for each edit, those from match moved_from on
+    # are stored shift short of where they are. The arrays are brought up
+    # to date when they are read, the methods here allow for the shift
+    def __init__(self, groups=0):
+        self.groups = groups
+        self._starts = array("q")
+        self._ends = array("q")
+        self._spans = array("q")
+        self.moved_from = 0
+        self.shift = 0
+
+    @property
+    def starts(self):
+        self.settle()
+        return self._starts
+
+    @property
+    def ends(self):
+        self.settle()
+        return self._ends
+
+    @property
+    def spans(self):
+        self.settle()
+        return self._spans
+
+    def settle(self):
+        if self.shift:
+            self.move(self.moved_from, len(self), self.shift)
+            self.shift = 0
+
+    def move(self, first, last, delta):
+        # adds delta to the offsets of matches [first, last)
+        if not delta or first >= last:
+            return
+        for offsets in (self._starts, self._ends):
+            offsets[first:last] = array(
+                "q", map(delta.__add__, offsets[first:last])
+            )
+        width = 2 * self.groups
+        i, j = first * width, last * width
+        self._spans[i:j] = self.moved(self._spans[i:j], delta)
+
+    def offset(self, index):
+        return self.shift if index >= self.moved_from else 0
+
+    def start(self, index):
+        return self._starts[index] + self.offset(index)
+
+    def end(self, index):
+        return self._ends[index] + self.offset(index)
+
+    def bisect(self, offsets, pos, lo=0, find=bisect_left):
+        # find in _starts or _ends as if the shift had been applied
+        if not self.shift:
+            return find(offsets, pos, lo)
+        i = find(offsets, pos, lo, max(lo, self.moved_from))
+        if i < self.moved_from:
+            return i
+        return find(offsets, pos - self.shift, max(lo, self.moved_from))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        # RegexMatch made on demand
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        width = 2 * self.groups
+        i = index * width
+        spans = self.moved(
+            self._spans[i : i + width], self.offset(index)  # noqa: E203
+        )
+        groups = [
+            Group(spans[j], spans[j + 1], j // 2 + 1)
+            for j in range(0, width, 2)
+        ]
+        return RegexMatch(self.start(index), self.end(index), groups)
+
+    def participating(self, group):
+        # the number of matches in which group (numbered from 1) matched,
+        # which the shift does not change
+        width = 2 * self.groups
+        starts = self._spans[2 * (group - 1) :: width]  # noqa: E203
+        return len(starts) - starts.count(-1)
+
+    def extend(self, regs):
+        # regs is an array of flattened match.regs, one record per match,
+        # which is consumed
+        self.settle()
+        width = 2 * (self.groups + 1)
+        self._starts.extend(regs[0::width])
+        self._ends.extend(regs[1::width])
+        # what is left after dropping both match columns are group spans
+        del regs[0::width]
+        del regs[0 :: width - 1]  # noqa: E203
+        self._spans.extend(regs)
+
+    def rematch(self, pattern, text, start, end, delta):
+        # text has been edited, [start, end) is new and everything after it
+        # has moved by delta - matches are found again from the last one
+        # before the edit up to the first one after it which is unchanged,
+        # the rest are only moved.
+        # A match can depend on text around it, so those which may see the
+        # edit are found again too
+        reach = lookaround_reach(pattern.pattern, pattern.flags)
+        first = max(self.bisect(self._ends, start - reach) - 1, 0)
+        if first and self._starts[first - 1] == self._ends[first - 1]:
+            # an empty match cannot be followed by another at the same
+            # position, so it is found again rather than resumed after
+            first -= 1
+            pos = self.start(first)
+        else:
+            pos = self.end(first - 1) if first else 0
+        count = len(self)
+        resume = count
+        regs = array("q")
+        for m in pattern.finditer(text, pos):
+            record = tuple(chain.from_iterable(m.regs))
+            if record[0] >= end + reach:
+                j = self.bisect(self._starts, record[0] - delta, first)
+                if j < count and self.record(j, delta) == record:
+                    resume = j
+                    break
+            regs.extend(record)
+        found = MatchStore(self.groups)
+        found.extend(regs)
+        # the matches from resume on are left shift + delta short, those
+        # between this edit and the last are moved now
+        if not self.shift:
+            moved_from = resume
+        elif self.moved_from > resume:
+            self.move(resume, self.moved_from, delta)
+            moved_from = self.moved_from
+        else:
+            self.move(self.moved_from, first, self.shift)
+            moved_from = resume
+        width = 2 * self.groups
+        self._starts[first:resume] = found._starts
+        self._ends[first:resume] = found._ends
+        self._spans[first * width : resume * width] = found._spans  # noqa: E203
+        self.moved_from = moved_from - (resume - first) + len(found)
+        self.shift += delta
+        return range(first, first + len(found))
+
+    def record(self, index, delta=0):
+        # the flattened match.regs of a match, moved by delta
+        i = index * 2 * self.groups
+        spans = self._spans[i : i + 2 * self.groups]  # noqa: E203
+        delta += self.offset(index)
+        return (
+            self._starts[index] + delta,
+            self._ends[index] + delta,
+        ) + tuple(self.moved(spans, delta))
+
+    @staticmethod
+    def moved(offsets, delta):
+        # -1 is a group which did not take part in the match
+        if not delta:
+            return offsets
+        return array("q", (x + delta if x >= 0 else x for x in offsets))
+
+    def group_span(self, index, group):
+        # group counts from 0 for the first group
+        i = 2 * (index * self.groups + group)
+        start, end = self._spans[i], self._spans[i + 1]
+        if start < 0:
+            return start, end
+        shift = self.offset(index)
+        return start + shift, end + shift
+
+    def find(self, pos):
+        # (match index, group index) at pos, the innermost/last group wins,
+        # -1 for either when there is none
+        mi = self.bisect(self._ends, pos)
+        if mi == len(self):
+            return (-1, -1)
+        for gi in range(self.groups - 1, -1, -1):
+            start, end = self.group_span(mi, gi)
+            if start < pos <= end:
+                return (mi, gi)
+        if self.start(mi) <= pos:
+            return (mi, -1)
+        return (-1, -1)
+
+    def overlapping(self, start, end):
+        # indexes of the matches which intersect [start, end)
+        first = self.bisect(self._ends, start, find=bisect_right)
+        return range(first, self.bisect(self._starts, end, first))
+
+
+class ResultCache:
+    # the matches of finished searches kept in directory, one file each
+    # named by a hash of the sample, pattern, flags and engine, holding
+    # the MatchStore arrays and, once worked out, the marker line numbers.
+    # Files are touched when read, so the least recently used are deleted
+    # once there are more than size bytes
+    version = 1
+
+    def __init__(self, directory, size=64 << 20):
+        self.directory = directory
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text, pattern, flags=0, engine="re"):
+        h = hashlib.blake2b(digest_size=20)
+        h.update(json.dumps([pattern, flags, engine]).encode())
+        h.update(b"\0")
+        h.update(text.encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.matches")
+
+    def get(self, key):
+        # (MatchStore, lines or None), or None if not cached
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                if header["version"] != self.version:
+                    raise ValueError("old version")
+                store = MatchStore(header["groups"])
+                count = header["count"]
+                for name, length in (
+                    ("starts", count),
+                    ("ends", count),
+                    ("spans", count * 2 * store.groups),
+                ):
+                    getattr(store, name).frombytes(f.read(length * 8))
+                lines = None
+                if header["lines"]:
+                    lines = array("q")
+                    lines.frombytes(f.read(count * 8))
+                if len(store.spans) != count * 2 * store.groups or (
+                    lines is not None and len(lines) != count
+                ):
+                    raise ValueError("truncated")
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError):
+            # unreadable, e.g. written by another version
+            self.misses += 1
+            self.remove(path)
+            return None
+        self.hits += 1
+        return store, lines
+
+    def put(self, key, store, lines=None):
+        arrays = [store.starts, store.ends, store.spans]
+        if lines is not None:
+            arrays.append(array("q", lines))
+        if sum(len(a) * 8 for a in arrays) > self.size:
+            return
+        header = dict(
+            version=self.version,
+            groups=store.groups,
+            count=len(store),
+            lines=lines is not None,
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # written in full before it replaces what is there
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                for a in arrays:
+                    a.tofile(f)
+            os.replace(tmp, path)
+        finally:
+            self.remove(tmp)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for e in it:
+                    if e.name.endswith(".matches"):
+                        st = e.stat()
+                        entries.append((st.st_mtime, st.st_size, e.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.size:
+                break
+            self.remove(path)
+            total -= size
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class LineOffsets:
+    # line numbers of byte offsets in a file - the line breaks in each block
+    # of block_size bytes are counted once, in a forward sweep only taken
+    # as far as the offsets asked for, so only a count per block is kept
+    block_size = 1 << 20
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        # line breaks before each block
+        self.counts = array("q", [0])
+
+    def line_at(self, offset):
+        buf = self.buffer
+        size = self.block_size
+        block = offset // size
+        counts = self.counts
+        while len(counts) <= block:
+            start = (len(counts) - 1) * size
+            block_end = start + size
+            counts.append(counts[-1] + buf[start:block_end].count(b"\n"))
+        start = block * size
+        return counts[block] + buf[start:offset].count(b"\n") + 1
+
+
+class MappedFile:
+    # a sample searched where it lies on disk - the pattern is compiled to
+    # bytes and run over a read only mapping of the file, so the text is
+    # never read into memory, offsets are in bytes. The editor shows a
+    # window of it, see context
+    context_lines = 100
+    context_size = 1 << 16
+
+    def __init__(self, filename, encoding="utf-8"):
+        self.filename = filename
+        self.encoding = encoding
+        with open(filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # an empty file cannot be mapped
+                self.buffer = b""
+        self.lines = LineOffsets(self.buffer)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __reduce__(self):
+        # mapped again when unpickled, e.g. in a subprocess
+        return (MappedFile, (self.filename, self.encoding))
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def compile(self, pattern, flags=0, engine="re"):
+        return ENGINES[engine].compile(
+            pattern.encode(self.encoding), flags & ~re.UNICODE
+        )
+
+    def context(self, start, end):
+        # whole lines around [start, end), within context_size bytes
+        # either side
+        buf = self.buffer
+        lo = max(start - self.context_size, 0)
+        hi = min(max(end, start + 1) + self.context_size, len(buf))
+        first = buf.rfind(b"\n", lo, start) + 1 or lo
+        for _ in range(self.context_lines):
+            if first <= lo:
+                break
+            first = buf.rfind(b"\n", lo, first - 1) + 1 or lo
+        last = min(end, hi)
+        for _ in range(self.context_lines + 1):
+            i = buf.find(b"\n", last, hi)
+            if i < 0:
+                last = hi
+                break
+            last = i + 1
+        return first, last
+
+    def decode(self, first, last, positions):
+        # text of [first, last) and the character offsets in it of the
+        # byte offsets in positions, with line breaks counted as one
+        # character like QTextDocument does
+        offsets = {}
+        count = 0
+        previous = first
+        for p in sorted(set(positions)):
+            segment = self.decode_bytes(previous, p)
+            count += len(segment) - segment.count("\r\n")
+            offsets[p] = count
+            previous = p
+        text = self.decode_bytes(first, last).replace("\r\n", "\n")
+        return text, offsets
+
+    def decode_bytes(self, start, end):
+        return self.buffer[start:end].decode(self.encoding, "replace")
+
+
+# a file of a corpus: the number of matches, the offset of the first one
+# (None if none), the time taken to search it and the error reading it
+CorpusResult = namedtuple("CorpusResult", "path count first seconds error")
+
+
+def corpus_files(spec):
+    # the files in a directory and below it, or those matching a glob
+    if os.path.isdir(spec):
+        spec = os.path.join(glob.escape(spec), "**", "*")
+    paths = glob.iglob(spec, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def survey(job):
+    # runs in a pool worker, offsets are in characters with line breaks
+    # read as one, as in the sample editor
+    pattern, path, encoding = job
+    try:
+        with open(path, encoding=encoding, errors="replace") as f:
+            text = f.read()
+    except OSError as e:
+        return CorpusResult(path, 0, None, 0.0, str(e))
+    start = perf_counter()
+    count = 0
+    first = None
+    for m in pattern.finditer(text):
+        if first is None:
+            first = m.regs[0][0]
+        count += 1
+    return CorpusResult(path, count, first, perf_counter() - start, None)
+
+
+# the patterns of a pattern set are combined into one alternation of named
+# groups, one per source, so that the sample is scanned once
+LEADING_FLAGS = re.compile(r"(?:\(\?[aiLmsux]+\))+")
+
+
+def pattern_name(filename, taken):
+    # a group name for the pattern in filename, unlike those in taken
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    name = re.sub(r"\W", "_", stem, flags=re.ASCII) or "pattern"
+    if not name[0].isalpha():
+        name = "p" + name
+    unique = name
+    n = 1
+    while unique in taken:
+        n += 1
+        unique = f"{name}_{n}"
+    return unique
+
+
+def has_backreference(node):
+    # anywhere in a parsed pattern, the opcodes are compared by identity as
+    # the arguments next to them are plain ints
+    if isinstance(node, sre_parse.SubPattern):
+        node = node.data
+    if not isinstance(node, (tuple, list)):
+        return False
+    if node and (
+        node[0] is sre_parse.GROUPREF or node[0] is sre_parse.GROUPREF_EXISTS
+    ):
+        return True
+    return any(has_backreference(n) for n in node)
+
+
+def first_chars(items):
+    # the characters a match of parsed items can start with, None if any
+    # could or the items can match an empty string
+    for op, av in items:
+        if op is sre_parse.AT:
+            # zero width
+            continue
+        if op is sre_parse.LITERAL:
+            return {chr(av)}
+        if op is sre_parse.IN:
+            chars = set()
+            for o, a in av:
+                if o is sre_parse.LITERAL:
+                    chars.add(chr(a))
+                elif o is sre_parse.RANGE and a[1] - a[0] < 256:
+                    chars.update(map(chr, range(a[0], a[1] + 1)))
+                else:
+                    return None
+            return chars
+        if op is sre_parse.SUBPATTERN:
+            if (av[1] | av[2]) & re.IGNORECASE:
+                return None
+            return first_chars(av[3])
+        if op is ATOMIC_GROUP:
+            return first_chars(av)
+        if op is sre_parse.BRANCH:
+            chars = set()
+            for branch in av[1]:
+                first = first_chars(branch)
+                if first is None:
+                    return None
+                chars |= first
+            return chars
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0]:
+            return first_chars(av[2])
+        return None
+    return None
+
+
+def combine_patterns(sources, flags=0, engine="re"):
+    # sources are (name, pattern) pairs, returns the combined pattern and
+    # the (name, reason) of the sources left out of it
+    alternatives = []
+    skipped = []
+    names = set()
+    # re cannot tell which characters the alternatives start with once
+    # they are in groups, so tries each of them everywhere - a lookahead
+    # for those characters skips the rest
+    guard = set() if ENGINES[engine].backtracking else None
+    for name, source in sources:
+        try:
+            parsed = sre_parse.parse(source, flags)
+        except re.error as e:
+            skipped.append((name, str(e)))
+            continue
+        if has_backreference(parsed):
+            # the groups they refer to are renumbered
+            skipped.append((name, "backreferences cannot be combined"))
+            continue
+        own = set(parsed.state.groupdict)
+        # the source's own name is a group name too
+        taken = (own | {name}) & names | own & {name}
+        if taken:
+            clash = ", ".join(sorted(taken))
+            skipped.append((name, f"group names used elsewhere: {clash}"))
+            continue
+        leading = LEADING_FLAGS.match(source)
+        if leading:
+            # global flags apply to this alternative only, those of
+            # consecutive groups such as (?i)(?s) are merged into one
+            letters = re.sub(r"[(?)]", "", leading.group())
+            inline = "".join(dict.fromkeys(letters))
+            source = f"(?{inline}:{source[leading.end():]}"
+            source += "\n)" if "x" in inline else ")"
+        elif parsed.state.flags & ~re.UNICODE != flags & ~re.UNICODE:
+            skipped.append((name, "global flags not at the start"))
+            continue
+        if flags & re.VERBOSE:
+            # a trailing comment would take the closing bracket with it
+            source += "\n"
+        alternative = f"(?P<{name}>{source})"
+        try:
+            sre_parse.parse(alternative, flags)
+        except re.error as e:
+            # e.g. flags which cannot be scoped
+            skipped.append((name, str(e)))
+            continue
+        names |= own | {name}
+        alternatives.append(alternative)
+        if guard is not None:
+            first = first_chars(parsed)
+            if first is None or (parsed.state.flags & ~flags & re.IGNORECASE):
+                guard = None
+            else:
+                guard |= first
+    separator = "\n|" if flags & re.VERBOSE else "|"
+    combined = separator.join(alternatives)
+    if guard and len(alternatives) > 1:
+        chars = "".join(re.escape(c) for c in sorted(guard))
+        if flags & re.VERBOSE:
+            combined = f"(?=[{chars}])(?:\n{combined}\n)"
+        else:
+            combined = f"(?=[{chars}])(?:{combined})"
+    return combined, skipped
+
+
+def source_of(groups, wrappers):
+    # the index in wrappers of the group which took part in the match,
+    # groups as in RegexMatch
+    for i, gid in enumerate(wrappers):
+        if groups[gid - 1].start >= 0:
+            return i
+    return -1
+
+
+# the matches of each source in the single pass and alone, the time taken
+# to search alone, and the time of the single pass
+SetRun = namedtuple("SetRun", "names combined alone times single")
+
+
+def compare_pattern_set(pattern, names, sources, flags, text, engine="re"):
+    # the combined pattern against each of its sources run separately
+    wrappers = [pattern.groupindex[n] for n in names]
+    start = perf_counter()
+    found = [m.regs for m in pattern.finditer(text)]
+    single = perf_counter() - start
+    combined = [0] * len(names)
+    for regs in found:
+        for i, gid in enumerate(wrappers):
+            if regs[gid][0] >= 0:
+                combined[i] += 1
+                break
+    alone = []
+    times = []
+    for source in sources:
+        compiled = ENGINES[engine].compile(source, flags)
+        start = perf_counter()
+        alone.append(len([m.regs for m in compiled.finditer(text)]))
+        times.append(perf_counter() - start)
+    return SetRun(names, combined, alone, times, single)
+
+
+def export_matches(
+    pattern, text, f, fmt="jsonl", names=None, batch=10000, matches=None
+):
+    # writes every match of pattern in text with its groups to the text
+    # file f as JSON lines or CSV, straight from finditer (or matches, e.g.
+    # a GuardedScan) and batch matches at a time, yielding the number
+    # written and the offset reached after each batch. names are the group
+    # names by group number
+    names = names or {}
+    if matches is None:
+        matches = pattern.finditer(text)
+    groups = range(1, pattern.groups + 1)
+    if fmt == "csv":
+        writer = csv.writer(f)
+        header = ["start", "end", "match"]
+        for i in groups:
+            label = names.get(i) or str(i)
+            header += [label, f"{label}_start", f"{label}_end"]
+        writer.writerow(header)
+    rows = []
+    count = 0
+    end = 0
+    for m in matches:
+        regs = m.regs
+        end = regs[0][1]
+        if fmt == "csv":
+            row = [regs[0][0], end, span_text(text, *regs[0])]
+            for start, stop in regs[1:]:
+                if start < 0:
+                    row += ["", "", ""]
+                else:
+                    row += [span_text(text, start, stop), start, stop]
+            rows.append(row)
+        else:
+            record = {
+                "start": regs[0][0],
+                "end": end,
+                "match": span_text(text, *regs[0]),
+                "groups": [
+                    {
+                        "index": i,
+                        "name": names.get(i),
+                        "start": start,
+                        "end": stop,
+                        "text": span_text(text, start, stop),
+                    }
+                    for i, (start, stop) in enumerate(regs[1:], 1)
+                    if start >= 0
+                ],
+            }
+            rows.append(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+        if len(rows) >= batch:
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                f.writelines(rows)
+            rows = []
+            yield count, end
+    if fmt == "csv":
+        writer.writerows(rows)
+    else:
+        f.writelines(rows)
+    yield count, len(text)
+
+
+def span_text(text, start, end):
+    # bytes from a file searched on disk are decoded
+    span = text[start:end]
+    if isinstance(span, bytes):
+        return span.decode("utf-8", "replace")
+    return span
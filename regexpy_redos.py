@@ -0,0 +1,460 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from regexpy_engine import parse_groups, sre_parse
+
+LINEAR, POLYNOMIAL, EXPONENTIAL = "linear", "polynomial", "exponential"
+RANK = {LINEAR: 0, POLYNOMIAL: 1, EXPONENTIAL: 2}
+
+# start and end are offsets in the pattern of the sub-expression to
+# highlight, degree is the exponent of a polynomial
+Finding = namedtuple("Finding", "complexity degree start end message")
+Analysis = namedtuple("Analysis", "complexity degree findings")
+# the characters a sub-expression can start and end with, those it can
+# match anywhere (as masks over Analyser.chars) and whether it can match
+# the empty string
+Info = namedtuple("Info", "first last alphabet nullable")
+
+REPEATS = (
+    sre_parse.MAX_REPEAT,
+    sre_parse.MIN_REPEAT,
+    getattr(sre_parse, "POSSESSIVE_REPEAT", None),  # Python >= 3.11
+)
+ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+MAXREPEAT = sre_parse.MAXREPEAT
+# repeats allowing this many more iterations than their minimum are
+# treated like unbounded ones, e.g. (\w+\s?){1,50}
+WIDE = 10
+# characters a class or "." may match besides those in the pattern
+SAMPLE_CHARS = [chr(i) for i in range(128)] + list(" éßЖ٣ 中\U0001f600")
+CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: r"\d",
+    sre_parse.CATEGORY_NOT_DIGIT: r"\D",
+    sre_parse.CATEGORY_SPACE: r"\s",
+    sre_parse.CATEGORY_NOT_SPACE: r"\S",
+    sre_parse.CATEGORY_WORD: r"\w",
+    sre_parse.CATEGORY_NOT_WORD: r"\W",
+}
+# a quantifier in braces, anything else starting with "{" is a literal
+BRACES = re.compile(r"\{(?:\d*,\d*|\d+)\}")
+
+
+def describe(complexity, degree=0):
+    if complexity == POLYNOMIAL:
+        return f"{complexity} (n^{degree})"
+    return complexity
+
+
+def quantifier_spans(pattern, flags=0):
+    # (start, end) of each quantifier with the item it repeats, in the
+    # order they end - the order re's parser builds them in
+    verbose = flags & re.VERBOSE
+    spans = []
+    opened = []
+    item = None
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        start = i
+        if verbose and c.isspace():
+            i += 1
+            continue
+        if verbose and c == "#":
+            i = pattern.find("\n", i)
+            i = n if i < 0 else i + 1
+            continue
+        if c == "\\":
+            i = escape_end(pattern, i)
+            item = start
+        elif c == "[":
+            i += 1
+            if pattern.startswith("^", i):
+                i += 1
+            if pattern.startswith("]", i):
+                i += 1
+            while i < n and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+            item = start
+        elif c == "(":
+            if pattern.startswith("(?#", i):
+                # a comment leaves the item before it to be repeated
+                i = pattern.find(")", i) + 1
+                continue
+            m = re.compile(r"\(\?[aiLmsux]+\)").match(pattern, i)
+            if m:
+                i = m.end()
+            else:
+                opened.append(i)
+                i += 1
+            item = None
+        elif c == ")":
+            i += 1
+            item = opened.pop() if opened else None
+        elif c == "|":
+            i += 1
+            item = None
+        elif c in "*+?" or (c == "{" and BRACES.match(pattern, i)):
+            if item is None:
+                i += 1
+                continue
+            i = BRACES.match(pattern, i).end() if c == "{" else i + 1
+            # lazy or possessive
+            if pattern.startswith(("?", "+"), i):
+                i += 1
+            spans.append((item, i))
+            item = None
+        else:
+            i += 1
+            item = start
+    return spans
+
+
+def escape_end(pattern, i):
+    c = pattern[i + 1 : i + 2]  # noqa: E203
+    if c in ("x", "u", "U"):
+        return i + 2 + {"x": 2, "u": 4, "U": 8}[c]
+    if c == "N":
+        return pattern.find("}", i) + 1
+    m = re.compile(r"0[0-7]{0,2}|[1-7][0-7]{2}|[1-9][0-9]?").match(
+        pattern, i + 1
+    )
+    if m:
+        return m.end()
+    return i + 2
+
+
+class Analyser:
+    # walks the pattern as parsed by re for the shapes that backtrack
+    # badly, see analyse
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        tree = sre_parse.parse(pattern, flags)
+        self.flags = tree.state.flags
+        self.tree = tree
+        self.chars = sorted(set(SAMPLE_CHARS) | set(pattern))
+        self.bits = {c: 1 << i for i, c in enumerate(self.chars)}
+        self.all = (1 << len(self.chars)) - 1
+        self.infos = {}
+        repeats = []
+        self.collect(tree, repeats)
+        spans = quantifier_spans(pattern, self.flags)
+        if len(spans) != len(repeats):
+            # unexpected syntax, findings cover the whole pattern
+            spans = [(0, len(pattern))] * len(repeats)
+        self.spans = {id(r): s for r, s in zip(repeats, spans)}
+        self.group_spans = {
+            g.index: (g.start, g.end + 1)
+            for g in parse_groups(pattern, self.flags)
+        }
+        self.findings = []
+
+    def collect(self, items, repeats):
+        # repeats, each after those inside it - by their (min, max, item)
+        # as the (op, av) tuples are unpacked as the tree is walked
+        for op, av in items:
+            for sub in self.children(op, av):
+                self.collect(sub, repeats)
+            if op in REPEATS:
+                repeats.append(av)
+
+    def children(self, op, av):
+        if op in REPEATS:
+            return [av[2]]
+        if op is sre_parse.SUBPATTERN:
+            return [av[3]]
+        if op is sre_parse.BRANCH:
+            return av[1]
+        if op is sre_parse.GROUPREF_EXISTS:
+            return [p for p in av[1:] if p is not None]
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            return [av[1]]
+        if op is ATOMIC_GROUP:
+            return [av]
+        return []
+
+    def text(self, node):
+        start, end = self.spans[id(node[1])]
+        return self.pattern[start:end]
+
+    def chars_matching(self, test):
+        mask = 0
+        for c, bit in self.bits.items():
+            if test(c):
+                mask |= bit
+        return mask
+
+    def charset(self, op, av, flags):
+        ignore_case = flags & re.IGNORECASE
+
+        def variants(c):
+            return {c, c.lower(), c.upper()} if ignore_case else {c}
+
+        if op is sre_parse.LITERAL:
+            lit = chr(av)
+            return self.chars_matching(lambda c: lit in variants(c))
+        if op is sre_parse.NOT_LITERAL:
+            lit = chr(av)
+            return self.chars_matching(lambda c: lit not in variants(c))
+        if op is sre_parse.ANY:
+            if flags & re.DOTALL:
+                return self.all
+            return self.all & ~self.bits["\n"]
+        # IN
+        mask = 0
+        negate = False
+        for item_op, item_av in av:
+            if item_op is sre_parse.NEGATE:
+                negate = True
+            elif item_op is sre_parse.LITERAL:
+                mask |= self.charset(item_op, item_av, flags)
+            elif item_op is sre_parse.RANGE:
+                lo, hi = map(chr, item_av)
+                mask |= self.chars_matching(
+                    lambda c: any(lo <= v <= hi for v in variants(c))
+                )
+            elif item_op is sre_parse.CATEGORY:
+                category = re.compile(CATEGORIES[item_av], flags & re.ASCII)
+                mask |= self.chars_matching(category.match)
+            else:
+                mask = self.all
+        return self.all & ~mask if negate else mask
+
+    def info(self, items, flags):
+        key = (id(items), flags)
+        if key not in self.infos:
+            first = last = alphabet = 0
+            nullable = True
+            for op, av in items:
+                f, la, a, n = self.node_info(op, av, flags)
+                if nullable:
+                    first |= f
+                last = la | (last if n else 0)
+                alphabet |= a
+                nullable = nullable and n
+            self.infos[key] = Info(first, last, alphabet, nullable)
+        return self.infos[key]
+
+    def node_info(self, op, av, flags):
+        if op in (
+            sre_parse.LITERAL,
+            sre_parse.NOT_LITERAL,
+            sre_parse.ANY,
+            sre_parse.IN,
+        ):
+            mask = self.charset(op, av, flags)
+            return Info(mask, mask, mask, False)
+        if op in REPEATS:
+            lo, hi, item = av
+            if hi == 0:
+                return Info(0, 0, 0, True)
+            info = self.info(item, flags)
+            return info._replace(nullable=lo == 0 or info.nullable)
+        if op is sre_parse.SUBPATTERN:
+            return self.info(av[3], (flags | av[1]) & ~av[2])
+        if op is sre_parse.GROUPREF:
+            return Info(self.all, self.all, self.all, True)
+        if op in (sre_parse.BRANCH, sre_parse.GROUPREF_EXISTS):
+            infos = [self.info(p, flags) for p in self.children(op, av)]
+            if op is sre_parse.GROUPREF_EXISTS and av[2] is None:
+                infos.append(Info(0, 0, 0, True))
+            first = last = alphabet = 0
+            for info in infos:
+                first |= info.first
+                last |= info.last
+                alphabet |= info.alphabet
+            return Info(first, last, alphabet, any(i.nullable for i in infos))
+        if op is ATOMIC_GROUP:
+            return self.info(av, flags)
+        # assertions and anchors
+        return Info(0, 0, 0, True)
+
+    def unwrap(self, op, av, flags):
+        # a group holding nothing but a repeat counts as the repeat
+        while op is sre_parse.SUBPATTERN and len(av[3]) == 1:
+            flags = (flags | av[1]) & ~av[2]
+            op, av = av[3][0]
+        return op, av, flags
+
+    def span(self, op, av):
+        # of a repeat, or a group around one
+        if op is sre_parse.SUBPATTERN and av[0] in self.group_spans:
+            return self.group_spans[av[0]]
+        return self.spans[id(self.unwrap(op, av, 0)[1])]
+
+    def is_wide(self, op, av):
+        return (
+            op in REPEATS
+            and op is not REPEATS[2]
+            and av[1] - av[0] >= (1 if av[1] == MAXREPEAT else WIDE)
+        )
+
+    def add(self, complexity, degree, span, message):
+        self.findings.append(Finding(complexity, degree, *span, message))
+
+    def walk(self, items, flags, followed):
+        # followed is whether something after items can fail and so
+        # make re backtrack into them
+        self.adjacent(items, flags, followed)
+        for i, (op, av) in enumerate(items):
+            after = followed or i < len(items) - 1
+            if op in REPEATS:
+                lo, hi, item = av
+                if after and self.is_wide(op, av):
+                    if not self.nested((op, av), flags):
+                        self.alternatives((op, av), flags)
+                # possessive repeats are not backtracked into
+                self.walk(
+                    item,
+                    flags,
+                    op is not REPEATS[2] and (hi > 1 or after),
+                )
+            elif op is sre_parse.SUBPATTERN:
+                self.walk(av[3], (flags | av[1]) & ~av[2], after)
+            elif op in (sre_parse.BRANCH, sre_parse.GROUPREF_EXISTS):
+                for p in self.children(op, av):
+                    self.walk(p, flags, after)
+            else:
+                # lookarounds and atomic groups are not backtracked into
+                # either
+                for p in self.children(op, av):
+                    self.walk(p, flags, False)
+
+    def inner(self, items, flags):
+        # repeats and branches inside items which are backtracked into
+        for op, av in items:
+            if op in REPEATS:
+                if op is REPEATS[2]:
+                    continue
+                yield op, av, flags
+                yield from self.inner(av[2], flags)
+            elif op is sre_parse.SUBPATTERN:
+                yield from self.inner(av[3], (flags | av[1]) & ~av[2])
+            elif op in (sre_parse.BRANCH, sre_parse.GROUPREF_EXISTS):
+                yield op, av, flags
+                for p in self.children(op, av):
+                    yield from self.inner(p, flags)
+
+    def nested(self, node, flags):
+        # e.g. (a+)+ or (\d+\.?)+ - a run of what the inner repeat
+        # matches can be split between the iterations of the outer one
+        # in exponentially many ways
+        items = node[1][2]
+        body = self.info(items, flags)
+        # on its own an optional item is matched once per iteration,
+        # re skips iterations that match nothing
+        whole = self.unwrap(*items[0], flags)[1] if len(items) == 1 else None
+        for op, av, inner_flags in self.inner(items, flags):
+            if op in REPEATS:
+                if av[1] <= av[0] or (av[1] == 1 and av is whole):
+                    continue
+                alphabet = self.info(av[2], inner_flags).alphabet
+                text = self.text((op, av))
+            elif op is sre_parse.BRANCH:
+                optional = [p for p in av[1] if self.info(p, flags).nullable]
+                if not optional or av is whole:
+                    continue
+                alphabet = self.node_info(op, av, inner_flags).alphabet
+                text = "an optional part"
+            else:
+                continue
+            if alphabet & body.first and alphabet & body.last:
+                self.add(
+                    EXPONENTIAL,
+                    0,
+                    self.spans[id(node[1])],
+                    f"nested quantifier, {text} repeated by"
+                    f" {self.text(node)}",
+                )
+                return True
+        return False
+
+    def alternatives(self, node, flags):
+        # e.g. (a|aa)+ - alternatives which start and end alike can match
+        # the same text in several ways on each iteration
+        for op, av, inner_flags in self.inner(node[1][2], flags):
+            if op is not sre_parse.BRANCH:
+                continue
+            infos = [self.info(p, inner_flags) for p in av[1]]
+            for i, a in enumerate(infos):
+                for b in infos[i + 1 :]:  # noqa: E203
+                    if a.first & b.first and a.last & b.last:
+                        self.add(
+                            EXPONENTIAL,
+                            0,
+                            self.spans[id(node[1])],
+                            "overlapping alternatives repeated by"
+                            f" {self.text(node)}",
+                        )
+                        return True
+        return False
+
+    def adjacent(self, items, flags, followed):
+        # e.g. \d+\d+ or .*=.* - each way of sharing a run between k such
+        # repeats is tried, n^k of them, when something after the first
+        # of them can fail
+        chain = []
+        common = 0
+        trailing = False
+        # an item between the repeats which has to match, like the = of
+        # .*=.*, fails the chain as well as one after it
+        inner = False
+        for node in items:
+            op, av, item_flags = self.unwrap(*node, flags)
+            if self.is_wide(op, av):
+                alphabet = self.info(av[2], item_flags).alphabet
+                if chain and alphabet & common:
+                    chain.append(node)
+                    common &= alphabet
+                    inner = inner or trailing
+                    trailing = False
+                    continue
+                self.chain(chain, True)
+                chain = [node]
+                common = alphabet
+                trailing = inner = False
+                continue
+            if chain:
+                info = self.node_info(op, av, item_flags)
+                if info.nullable:
+                    continue
+                trailing = True
+                if not info.alphabet & ~common:
+                    # matched by the repeats too
+                    continue
+                self.chain(chain, True)
+                chain = []
+        self.chain(chain, followed or trailing or inner)
+
+    def chain(self, chain, followed):
+        if len(chain) < 2 or not followed:
+            return
+        start = self.span(*chain[0])[0]
+        end = self.span(*chain[-1])[1]
+        self.add(
+            POLYNOMIAL,
+            len(chain),
+            (start, end),
+            f"adjacent quantifiers {self.pattern[start:end]} can match"
+            " the same text",
+        )
+
+    def analyse(self):
+        self.walk(self.tree, self.flags, False)
+        findings = sorted(self.findings, key=lambda f: (f.start, f.end))
+        complexity, degree = LINEAR, 0
+        for f in findings:
+            if (RANK[f.complexity], f.degree) > (RANK[complexity], degree):
+                complexity, degree = f.complexity, f.degree
+        return Analysis(complexity, degree, tuple(findings))
+
+
+@lru_cache(maxsize=256)
+def analyse(pattern, flags=0):
+    # a static estimate of how re's backtracking can scale with the
+    # length of the text for pattern: nested quantifiers, overlapping
+    # alternatives under a quantifier and adjacent quantifiers which can
+    # match the same text
+    return Analyser(pattern, flags).analyse()
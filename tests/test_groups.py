@@ -0,0 +1,81 @@
+import re
+
+import pytest
+
+from regexpy_engine import Expression, parse_groups
+
+
+def groups(pattern, flags=0):
+    # (index, level, parent, name, source) of each group
+    return [
+        (g.index, g.level, g.parent, g.name, source_of(pattern, g))
+        for g in parse_groups(pattern, flags)
+    ]
+
+
+def source_of(pattern, group):
+    return pattern[group.start : group.end + 1]  # noqa: E203
+
+
+@pytest.mark.parametrize(
+    "pattern, source",
+    [
+        # escaped brackets
+        (r"\((a)\)", "(a)"),
+        (r"\\(a)", "(a)"),
+        # brackets in classes
+        (r"[(](b)[)]", "(b)"),
+        (r"[^()](c)", "(c)"),
+        (r"[\]((]+(d)", "(d)"),
+        # non-capturing groups, comments and lookarounds around a group
+        (r"(?:(e))", "(e)"),
+        (r"(?i:(f))", "(f)"),
+        (r"(?#(x)(g)", "(g)"),
+        (r"(?<=(h))b", "(h)"),
+        (r"(?<!x)(i)", "(i)"),
+        (r"(?=(j))", "(j)"),
+        (r"(k)(?(1)b|c)", "(k)"),
+    ],
+)
+def test_group_is_located(pattern, source):
+    assert groups(pattern) == [(1, 0, 0, None, source)]
+
+
+def test_named_group_and_reference():
+    assert groups(r"(?P<n>a)(?P=n)") == [(1, 0, 0, "n", "(?P<n>a)")]
+
+
+def test_nested_groups():
+    assert groups(r"((a)(b(c)))") == [
+        (1, 0, 0, None, "((a)(b(c)))"),
+        (2, 1, 1, None, "(a)"),
+        (3, 1, 1, None, "(b(c))"),
+        (4, 2, 3, None, "(c)"),
+    ]
+    assert groups(r"(?P<x>(?P<y>a)|b)(c)") == [
+        (1, 0, 0, "x", "(?P<x>(?P<y>a)|b)"),
+        (2, 1, 1, "y", "(?P<y>a)"),
+        (3, 0, 0, None, "(c)"),
+    ]
+
+
+def test_verbose_comments_and_whitespace():
+    assert groups("( # (\n a ) (b)", re.VERBOSE) == [
+        (1, 0, 0, None, "( # (\n a )"),
+        (2, 0, 0, None, "(b)"),
+    ]
+
+
+def test_syntax_re_does_not_know():
+    # from another engine, its groups are numbered but not located
+    class Pattern:
+        pattern = r"(?P<a>x)(?|(y)|(z))"
+        flags = 0
+        groups = 2
+        groupindex = {"a": 1}
+
+    expression = Expression(Pattern)
+    assert [(g.index, g.name, g.start) for g in expression.groups] == [
+        (1, "a", -1),
+        (2, None, -1),
+    ]
@@ -0,0 +1,85 @@
+import re
+
+from regexpy_engine import combine_patterns, first_chars, sre_parse
+
+
+def names(pattern, text):
+    return [m.lastgroup for m in re.finditer(pattern, text)]
+
+
+def test_combined_alternatives_are_named():
+    combined, skipped = combine_patterns([("a", "x+"), ("b", "y")])
+    assert skipped == []
+    assert names(combined, "xx y x") == ["a", "b", "a"]
+
+
+def test_leading_flags_are_scoped():
+    combined, skipped = combine_patterns([("a", "(?i)abc"), ("b", "x")])
+    assert skipped == []
+    assert names(combined, "ABC X x") == ["a", "b"]
+
+
+def test_consecutive_leading_flags_are_merged():
+    combined, skipped = combine_patterns([("a", "(?i)(?s)a.c"), ("b", "x")])
+    assert skipped == []
+    assert "(?is:" in combined
+    assert names(combined, "A\nC x") == ["a", "b"]
+
+
+def test_verbose_leading_flag():
+    combined, skipped = combine_patterns([("a", "(?x) a b # c"), ("b", "x")])
+    assert skipped == []
+    assert names(combined, "ab x") == ["a", "b"]
+
+
+def test_backreferences_and_name_clashes_are_skipped():
+    combined, skipped = combine_patterns(
+        [("a", r"(x)\1"), ("b", "(?P<n>y)"), ("c", "(?P<n>z)")]
+    )
+    assert [name for name, _ in skipped] == ["a", "c"]
+    assert names(combined, "xx y z") == ["b"]
+
+
+def test_names_clashing_with_groups_are_skipped():
+    combined, skipped = combine_patterns(
+        [("a", "(?P<b>x)"), ("b", "y"), ("c", "(?P<a>z)"), ("d", "(?P<d>w)")]
+    )
+    assert [name for name, _ in skipped] == ["b", "c", "d"]
+    re.compile(combined)
+
+
+def test_global_flags_not_at_the_start_are_skipped():
+    combined, skipped = combine_patterns([("a", "x(?i)"), ("b", "y")])
+    assert [name for name, _ in skipped] == ["a"]
+
+
+def test_unscopable_flags_are_skipped():
+    combined, skipped = combine_patterns([("a", "(?L)x"), ("b", "y")])
+    assert [name for name, _ in skipped] == ["a"]
+    re.compile(combined)
+
+
+def test_guard_keeps_matches():
+    sources = [("a", "foo"), ("b", "[0-9]+"), ("c", "(?:bar|baz)")]
+    combined, _ = combine_patterns(sources)
+    assert combined.startswith("(?=")
+    text = "foo 12 bar x baz 3"
+    assert names(combined, text) == ["a", "b", "c", "c", "b"]
+
+
+def test_no_guard_when_an_alternative_can_start_anywhere():
+    combined, _ = combine_patterns([("a", "foo"), ("b", ".x")])
+    assert not combined.startswith("(?=")
+
+
+def test_first_chars():
+    def first(pattern):
+        return first_chars(sre_parse.parse(pattern))
+
+    assert first("abc") == {"a"}
+    assert first("[a-c]x") == {"a", "b", "c"}
+    assert first("x|y") == {"x", "y"}
+    assert first("^(?:a+|b)") == {"a", "b"}
+    assert first("a*b") is None
+    assert first(".") is None
+    assert first("(?>ab)") == {"a"}
@@ -0,0 +1,144 @@
+import re
+
+import pytest
+
+from regexpy_redos import (
+    EXPONENTIAL,
+    LINEAR,
+    POLYNOMIAL,
+    analyse,
+    describe,
+    quantifier_spans,
+)
+
+
+def findings(pattern, flags=0):
+    return [
+        (f.complexity, pattern[f.start : f.end])  # noqa: E203
+        for f in analyse(pattern, flags).findings
+    ]
+
+
+@pytest.mark.parametrize(
+    "pattern, span",
+    [
+        (r"(a+)+$", "(a+)+"),
+        (r"(a*)*b", "(a*)*"),
+        (r"(\d+\.?)+x", r"(\d+\.?)+"),
+        (r"(?:\d+)*\.", r"(?:\d+)*"),
+        (r"(.*,)*x", "(.*,)*"),
+        (r"(\w+\s?){1,50}$", r"(\w+\s?){1,50}"),
+    ],
+)
+def test_nested_quantifiers(pattern, span):
+    analysis = analyse(pattern)
+    assert analysis.complexity == EXPONENTIAL
+    assert findings(pattern)[0] == (EXPONENTIAL, span)
+    assert "nested quantifier" in analysis.findings[0].message
+
+
+def test_overlapping_alternatives():
+    analysis = analyse(r"(a|aa)+$")
+    assert analysis.complexity == EXPONENTIAL
+    assert findings(r"(a|aa)+$") == [(EXPONENTIAL, "(a|aa)+")]
+
+
+@pytest.mark.parametrize(
+    "pattern, span",
+    [
+        (r"\d+\d+x", r"\d+\d+"),
+        (r".*=.*;", ".*=.*"),
+        (r"a.*b.*c", ".*b.*"),
+    ],
+)
+def test_adjacent_quantifiers(pattern, span):
+    analysis = analyse(pattern)
+    assert (analysis.complexity, analysis.degree) == (POLYNOMIAL, 2)
+    assert findings(pattern) == [(POLYNOMIAL, span)]
+    assert "adjacent quantifiers" in analysis.findings[0].message
+
+
+@pytest.mark.parametrize(
+    "pattern, span, degree",
+    [
+        # the = between the repeats can fail with nothing after them
+        (r".*=.*", ".*=.*", 2),
+        (r".*.*=.*", ".*.*=.*", 3),
+        (r"x.*.*=.*", ".*.*=.*", 3),
+        (r".*,.*,.*", ".*,.*,.*", 3),
+    ],
+)
+def test_adjacent_quantifiers_at_the_end(pattern, span, degree):
+    analysis = analyse(pattern)
+    assert (analysis.complexity, analysis.degree) == (POLYNOMIAL, degree)
+    assert findings(pattern) == [(POLYNOMIAL, span)]
+
+
+def test_nested_and_adjacent_are_both_reported():
+    assert findings(r"(x+x+)+y") == [
+        (EXPONENTIAL, "(x+x+)+"),
+        (POLYNOMIAL, "x+x+"),
+    ]
+    assert analyse(r"(x+x+)+y").complexity == EXPONENTIAL
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        # not backtracked into
+        r"(?:a+)++b",
+        r"(?>a+)+b",
+        # disjoint first and last characters
+        r"(a|b)+$",
+        r"(ab|cd)+x",
+        r"\w+\s+\w+",
+        r"[0-9]+[a-z]+",
+        r"\s*\S+\s*$",
+        r"^[a-z]+@[a-z]+\.[a-z]+$",
+        r"(?i)(a|A)+$",
+        # nothing after the quantifiers can fail
+        r"(a+)+",
+        r"\d+\d+",
+        r"\d+\d+a?",
+        r".*a?.*",
+        # too few repetitions to matter
+        r"(\w+\s?){1,3}$",
+        r"(a?){20}",
+        r"x*y*z",
+        r"a+b",
+    ],
+)
+def test_safe_patterns(pattern):
+    analysis = analyse(pattern)
+    assert (analysis.complexity, analysis.findings) == (LINEAR, ())
+
+
+@pytest.mark.parametrize(
+    "pattern, flags, spans",
+    [
+        (r"a+", 0, ["a+"]),
+        (r"(ab)*c?", 0, ["(ab)*", "c?"]),
+        (r"[a\]]+x{2,3}", 0, [r"[a\]]+", "x{2,3}"]),
+        (r"[]a]+[^]b]*", 0, ["[]a]+", "[^]b]*"]),
+        (r"\x41+B*", 0, [r"\x41+", "B*"]),
+        (r"\(+", 0, [r"\(+"]),
+        (r"(?i)a+", 0, ["a+"]),
+        (r"a(?#c)+", 0, ["a(?#c)+"]),
+        (r"a{,3}b{x}", 0, ["a{,3}"]),
+        (r"a+?b*+", 0, ["a+?", "b*+"]),
+        ("a + # c+\n b*", re.VERBOSE, ["a +", "b*"]),
+        (r"(a(b)+)*", 0, ["(b)+", "(a(b)+)*"]),
+    ],
+)
+def test_quantifier_spans(pattern, flags, spans):
+    found = [
+        pattern[start:end]  # noqa: E203
+        for start, end in quantifier_spans(pattern, flags)
+    ]
+    assert found == spans
+
+
+def test_describe():
+    assert describe(LINEAR) == LINEAR
+    assert describe(EXPONENTIAL) == EXPONENTIAL
+    assert describe(POLYNOMIAL, 3) == f"{POLYNOMIAL} (n^3)"
@@ -0,0 +1,119 @@
+import random
+import re
+from array import array
+from itertools import chain
+
+import pytest
+
+from regexpy_engine import MatchStore, lookaround_reach, sre_parse
+
+PATTERNS = [
+    r"a+",
+    r"x*",
+    r"(a)|(b)",
+    r"(a|b)(c)?",
+    r"\bab*",
+    r"^\w+$",
+    r"(?m)^a|b$",
+    r"(?<=a)b+",
+    r"(?<=b..)a",
+    r"(?<!a)b",
+    r"a(?=b)",
+    r"a(?=...b)",
+    r"a(?!b)c?",
+    r"a(?=.(?=.b))",
+    # lookaheads which can see any distance
+    r"a(?=.*b)",
+    r"a(?=[^b]*$)",
+]
+
+
+def store(pattern, text):
+    matches = MatchStore(pattern.groups)
+    matches.extend(
+        array(
+            "q",
+            chain.from_iterable(
+                chain.from_iterable(m.regs) for m in pattern.finditer(text)
+            ),
+        )
+    )
+    return matches
+
+
+def records(matches):
+    return [matches.record(i) for i in range(len(matches))]
+
+
+def edit(rng, text, merged):
+    # one random edit and the edits so far as one, as the GUI merges them
+    pos = rng.randrange(len(text) + 1)
+    removed = rng.randrange(min(3, len(text) - pos) + 1)
+    added = rng.randrange(4)
+    insert = "".join(rng.choice("abcx \n") for _ in range(added))
+    text = text[:pos] + insert + text[pos + removed :]  # noqa: E203
+    if merged is None:
+        return text, (pos, pos + added, added - removed)
+    start, end, delta = merged
+    start = min(start, pos)
+    end = max(end, pos + removed) + added - removed
+    return text, (start, end, delta + added - removed)
+
+
+@pytest.mark.parametrize("source", PATTERNS)
+def test_rematch_matches_full_search(source):
+    rng = random.Random(source)
+    pattern = re.compile(source)
+    for _ in range(200):
+        text = "".join(rng.choice("abcx \n") for _ in range(rng.randrange(40)))
+        matches = store(pattern, text)
+        merged = None
+        for _ in range(rng.randrange(1, 4)):
+            text, merged = edit(rng, text, merged)
+        matches.rematch(pattern, text, *merged)
+        assert records(matches) == records(store(pattern, text)), (
+            text,
+            merged,
+        )
+
+
+@pytest.mark.parametrize("source", PATTERNS)
+def test_successive_rematches(source):
+    # each rematch leaves the matches after the edit to be moved later
+    rng = random.Random(source)
+    pattern = re.compile(source)
+    for _ in range(50):
+        text = "".join(rng.choice("abcx \n") for _ in range(rng.randrange(80)))
+        matches = store(pattern, text)
+        for _ in range(rng.randrange(1, 8)):
+            text, edited = edit(rng, text, None)
+            matches.rematch(pattern, text, *edited)
+            full = store(pattern, text)
+            assert records(matches) == records(full), text
+            assert matches[:] == full[:]
+            for pos in range(len(text) + 1):
+                assert matches.find(pos) == full.find(pos)
+            assert matches.overlapping(5, 20) == full.overlapping(5, 20)
+        assert (matches.starts, matches.ends, matches.spans) == (
+            full.starts,
+            full.ends,
+            full.spans,
+        )
+
+
+def test_rematch_returns_the_matches_found_again():
+    pattern = re.compile(r"\d+")
+    matches = store(pattern, "1 22 333 4444")
+    text = "1 22 3x33 4444"
+    found = matches.rematch(pattern, text, 6, 7, 1)
+    assert found.start <= 2 < found.stop
+    assert records(matches) == records(store(pattern, text))
+
+
+def test_lookaround_reach():
+    assert lookaround_reach(r"a+b") == 0
+    assert lookaround_reach(r"\ba") == 1
+    assert lookaround_reach(r"(?<=ab)c(?=d{2,3})") == 5
+    assert lookaround_reach(r"a(?=.(?=.b))") == 3
+    assert lookaround_reach(r"a(?=.*b)") == sre_parse.MAXREPEAT
+    assert lookaround_reach(r"(") == sre_parse.MAXREPEAT